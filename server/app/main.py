@@ -1,11 +1,29 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from app.utils.logging_config import configure_logging
+
+# Before the routers are imported, so their import-time log lines go through the queue
+configure_logging()
+
 from app.routers import models,auth,schedules #, study_sessions
+from app.services.metrics import REQUEST_LATENCY
+from app.services.warmup import start_warmup, warmup_status
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Preload the heavy dependencies in the background; startup doesn't wait for it
+    start_warmup()
+    yield
 
 app = FastAPI(
     title="StudyGPT",
     description="An AI-powered study assistant and note-taking platform",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS setup
@@ -23,6 +41,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON responses; responses that already carry a Content-Encoding pass through
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep label cardinality bounded
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method,
+            route.path if route else "unmatched",
+            str(status_code)
+        ).observe(time.perf_counter() - started)
+
 # Include routers
 app.include_router(models.router, prefix="/models", tags=["Models"])
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
@@ -35,7 +73,12 @@ def read_root():
 
 @app.get("/health", tags=["Health"])
 def health_check():
-    return {"status": "Server is running!"}
+    return {"status": "Server is running!", "warmup": warmup_status()}
+
+@app.get("/metrics", tags=["Health"])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     import uvicorn
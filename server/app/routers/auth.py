@@ -1,13 +1,46 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from collections import OrderedDict
+from typing import Optional, Tuple
+import hashlib
+import time
 import jwt
 from app.schemas.auth_schema import TokenSchema, UserData, VerifyResponse
 import os
 
 router = APIRouter()
 security = HTTPBearer()
+optional_bearer = HTTPBearer(auto_error=False)
+
+# Verified claims by sha256 of the access token, kept until the token's exp
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+_verified_tokens: "OrderedDict[str, Tuple[UserData, float]]" = OrderedDict()
+
+def _cached_user(token_hash: str) -> Optional[UserData]:
+    entry = _verified_tokens.get(token_hash)
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if expires_at <= time.time():
+        del _verified_tokens[token_hash]
+        return None
+    _verified_tokens.move_to_end(token_hash)
+    return user
+
+def _cache_user(token_hash: str, user: UserData, expires_at: Optional[float]):
+    if not expires_at:
+        return
+    _verified_tokens[token_hash] = (user, expires_at)
+    _verified_tokens.move_to_end(token_hash)
+    while len(_verified_tokens) > AUTH_CACHE_SIZE:
+        _verified_tokens.popitem(last=False)
 
 async def get_current_user_from_token(token: TokenSchema) -> UserData:
+    token_hash = hashlib.sha256(token.access_token.encode("utf-8")).hexdigest()
+    user = _cached_user(token_hash)
+    if user is not None:
+        return user
+
     try:
         jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
         if not jwt_secret:
@@ -27,13 +60,15 @@ async def get_current_user_from_token(token: TokenSchema) -> UserData:
         # Extract user metadata from the token
         user_metadata = payload.get('user_metadata', {})
 
-        return UserData(
+        user = UserData(
             id=payload.get('sub'),
             email=payload.get('email'),
             full_name=user_metadata.get('full_name'),
             avatar_url=user_metadata.get('avatar_url'),
             provider=payload.get('app_metadata', {}).get('provider')
         )
+        _cache_user(token_hash, user, payload.get('exp'))
+        return user
 
     except jwt.ExpiredSignatureError:
         # If access token is expired and refresh token is provided
@@ -129,6 +164,35 @@ async def get_current_user(
         )
 '''
 
+async def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer)
+) -> UserData:
+    """
+    Auth dependency: takes the access token from an Authorization: Bearer header,
+    or from a JSON body holding either a TokenSchema or a {"token": TokenSchema} field
+    """
+    access_token = credentials.credentials if credentials else None
+    refresh_token = request.headers.get("X-Refresh-Token") or ""
+
+    if access_token is None and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict):
+            body_token = body.get("token", body)
+            if isinstance(body_token, dict):
+                access_token = body_token.get("access_token")
+                refresh_token = body_token.get("refresh_token") or refresh_token
+
+    if not access_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    return await get_current_user_from_token(
+        TokenSchema(access_token=access_token, refresh_token=refresh_token)
+    )
+
 @router.post("/verify", response_model=VerifyResponse)
 async def verify_auth(token: TokenSchema):
     """
@@ -1,82 +1,68 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Response
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Response, Depends, Request
 from fastapi.security import HTTPBearer
 from fastapi.responses import JSONResponse
 import uuid
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import logging
-from logging.handlers import RotatingFileHandler
 import os
 import json
+import time
 
 import aiofiles
-from app.services.supabase_service import supabase
-from app.routers.auth import verify_auth
-from app.schemas.auth_schema import TokenSchema
+import asyncio
+from app.services.repository import SupabaseRepository, get_repository
+from app.services.cache import (CachedBody, response_cache, output_key, output_manifest_key, output_module_key,
+                                current_subject_key, cached_json_response)
+from app.utils.output_format import (OUTPUT_FILENAME, LEGACY_OUTPUT_FILENAME, GZIP_MAGIC, SHARD_DIR, MANIFEST_FILENAME,
+                                     SECTIONS, encode_output, decode_output, split_output, merge_shards, build_manifest)
+from app.routers.auth import get_current_user
+from app.schemas.auth_schema import UserData
 from app.schemas.model_schemas import PostRequest, PostResponse, FileDetail, CurrentSubjectResponse
+from app.services.metrics import observe_stage, JOB_FAILURES, JOB_QUEUE_DEPTH
+from app.services.disk_cache import get_data_cache, storage_version
+from app.utils.transfer import VERIFY_UPLOADS, etag_md5, file_md5, verify_transfer
 from model.src.config import Config
-from model.src.utils.pdf_utils import extract_text_from_pdf
-from model.src.generator.content_generator import ContentGenerator
+# pdfminer and the generator stack (OpenAI, tiktoken, LangChain, FAISS) are imported
+# on first use so the API starts serving quickly; app.services.warmup preloads them
+from model.src.generator.checkpoint import GenerationCheckpoint
+from model.src.utils.tracing import start_trace, span, in_current_context
+from model.src.utils.scheduling import get_scheduler, start_job, classify_job
+from model.src.utils.question_paper import INDEX_FILENAME, build_question_index
 
 ''' db enetering import code '''
 import json
 from typing import Dict, List, Any
 ''''''
 
-# Create logs directory if it doesn't exist
-os.makedirs('logs', exist_ok=True)
-
-# Configure logging
+# Handlers are set up once in app.utils.logging_config
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-# Create formatters
-file_formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-console_formatter = logging.Formatter(
-    '%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
-# Create and configure file handler with rotation
-file_handler = RotatingFileHandler(
-    'logs/app.log',
-    maxBytes=10*1024*1024,  # 10MB
-    backupCount=5
-)
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(file_formatter)
-
-# Create and configure console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(console_formatter)
-
-# Add handlers to logger
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
-
-# Remove any existing handlers from the root logger
-logging.getLogger().handlers = []
 
 router = APIRouter()
 
 # Add new status tracking dictionary
 #processing_status = {}
 
-async def download_file(url: str, save_path: str):
-    """Download a file from URL and save it locally"""
+async def download_file(url: str, save_path: str, repo: SupabaseRepository,
+                        file_info: Optional[Dict[str, Any]] = None):
+    """
+    Stream a file from storage to save_path through the data cache.
+
+    The file only replaces save_path once it is complete and, when the storage listing
+    entry file_info gives them, matches the listed size and MD5 ETag.
+    """
     try:
         logger.info(f"Starting download of file from URL: {url}")
-        bucket_path = url.split("study_materials/")[1]
+        # Public URLs end in an empty query string
+        bucket_path = url.split("study_materials/")[1].split("?")[0]
         logger.debug(f"Extracted bucket path: {bucket_path}")
-        
-        async with aiofiles.open(save_path, 'wb+') as f:
-            logger.debug(f"Downloading from Supabase storage to: {save_path}")
-            response = supabase.storage.from_("study_materials").download(bucket_path)
-            await f.write(response)
-            logger.info(f"Successfully downloaded and saved file to: {save_path}")
+        metadata = (file_info or {}).get("metadata") or {}
+
+        logger.debug(f"Downloading from Supabase storage to: {save_path}")
+        with span("download", file=os.path.basename(save_path)):
+            async with get_data_cache().atomic_file(save_path, storage_version(file_info or {})) as f:
+                size, md5 = await repo.download_to(bucket_path, f)
+                verify_transfer(bucket_path, size, md5, metadata.get("size"), etag_md5(metadata.get("eTag")))
+        logger.info(f"Successfully downloaded and saved file to: {save_path}")
         return True
     except Exception as e:
         logger.error(f"Error in download_file: {str(e)}")
@@ -84,6 +70,8 @@ async def download_file(url: str, save_path: str):
 
 def load_multiple_pdfs(file_paths):
     """Extract and concatenate text from multiple PDF files."""
+    from model.src.utils.pdf_utils import extract_text_from_pdf
+
     all_text = ""
     logger.info(f"Starting PDF processing for {len(file_paths)} files")
     for path in file_paths:
@@ -100,8 +88,11 @@ def load_multiple_pdfs(file_paths):
 
 def load_pdf(file_path: str) -> str:
     """Extract text from a single PDF file with error handling"""
+    from model.src.utils.pdf_utils import extract_text_from_pdf
+
     try:
-        text = extract_text_from_pdf(file_path)
+        with span("extract", file=os.path.basename(file_path)):
+            text = extract_text_from_pdf(file_path)
         return text if text else ""
     except Exception as e:
         logger.error(f"Error reading PDF {file_path}: {str(e)}")
@@ -122,113 +113,234 @@ def load_module_notes(notes_files: list) -> Dict[str, str]:
     
     return module_notes
 
+async def extract_job_texts(saved_files: Dict[str, List[str]]) -> Tuple[str, List[str], Dict[str, str]]:
+    """
+    Extract a job's syllabus, question papers and module notes on the shared extraction pool.
 
+    The PDFs are queued together, so the pool interleaves them fairly with other users' jobs
+    and the event loop stays free while pdfminer runs.
+    """
+    scheduler = get_scheduler("extract", Config.EXTRACT_WORKERS)
+
+    def extract(file_path: str):
+        return asyncio.wrap_future(scheduler.submit(in_current_context(load_pdf), file_path))
+
+    # Only notes named like modX.pdf map to a module
+    notes_files = [
+        file_path for file_path in saved_files["notes"]
+        if os.path.splitext(os.path.basename(file_path))[0].startswith('mod')
+    ]
+    syllabus_text, questions_texts, notes_texts = await asyncio.gather(
+        extract(saved_files["syllabus"][0]) if saved_files["syllabus"] else asyncio.sleep(0, ""),
+        asyncio.gather(*(extract(file_path) for file_path in saved_files["pyq"])),
+        asyncio.gather(*(extract(file_path) for file_path in notes_files))
+    )
+    module_notes = {
+        os.path.splitext(os.path.basename(file_path))[0]: text
+        for file_path, text in zip(notes_files, notes_texts)
+        if text
+    }
+    return syllabus_text, list(questions_texts), module_notes
+
+
+
+# Rows sent per insert_subject_content call; bigger subjects are split over a few calls
+BULK_INSERT_MAX_ROWS = 500
+
+def group_content_by_module(content: Dict[str, Any]) -> Dict[str, Dict[str, List]]:
+    """Collect flashcards, topics and questions per module number, ready for insertion"""
+    modules = {}
+
+    def module_rows(module_key: str) -> Dict[str, List]:
+        module_no = str(module_key).replace("mod", "").strip()
+        return modules.setdefault(module_no, {"flashcards": [], "topics": [], "questions": []})
+
+    for module_key, cards in content.get("flashcards", {}).items():
+        if isinstance(cards, list):
+            rows = module_rows(module_key)
+            for card in cards:
+                if isinstance(card, dict):
+                    rows["flashcards"].append({
+                        "question": str(card.get("question", "")),
+                        "answer": str(card.get("answer", "")),
+                        "module_no": str(module_key).replace("mod", "").strip()
+                    })
 
-async def insert_content_to_database(user_id: str, subject: str, content: Dict[str, Any], logger: logging.Logger):
-    try:
-        logger.info("=== Starting database insertion process ===")
-        
-        # Get subject_id from database
-        subject_response = supabase.table("subjects")\
-            .select("id")\
-            .eq("user_id", user_id)\
-            .eq("subject_name", subject)\
-            .execute()
-            
-        if not subject_response.data:
-            logger.error(f"Subject not found for user {user_id}")
-            raise ValueError("Subject not found in database")
-            
-        subject_id = subject_response.data[0]['id']
-        
-        # Insert flashcards
-        logger.info("Inserting flashcards...")
-        flashcards_dict = content.get("flashcards", {})
-        
-        if flashcards_dict:
+    for module_name, topics in content.get("important_topics", {}).items():
+        if topics:
+            module_rows(module_name)["topics"] = topics
+
+    for module_name, questions in content.get("important_qna", {}).items():
+        if questions:
+            # Convert questions to JSONB format
+            module_rows(module_name)["questions"] = [
+                {
+                    "question": qa["question"],
+                    "answer": qa["answer"]
+                } for qa in questions
+                if isinstance(qa, dict) and "question" in qa and "answer" in qa
+            ]
+
+    return modules
+
+def batch_modules(modules: Dict[str, Dict[str, List]], max_rows: int) -> List[Dict[str, Dict[str, List]]]:
+    """Split modules into batches of at most max_rows rows, never splitting a module"""
+    batches, current, current_rows = [], {}, 0
+    for module_no, rows in modules.items():
+        size = sum(len(items) for items in rows.values())
+        if current and current_rows + size > max_rows:
+            batches.append(current)
+            current, current_rows = {}, 0
+        current[module_no] = rows
+        current_rows += size
+    if current:
+        batches.append(current)
+    return batches
+
+async def insert_batch_bulk(repo: SupabaseRepository, subject_id: str, batch: Dict[str, Dict[str, List]],
+                            report: Dict[str, Any]):
+    """Insert a batch in one transactional RPC; raises if nothing was written"""
+    flashcards = [card for rows in batch.values() for card in rows["flashcards"]]
+    topics = [{"module_no": no, "topics": rows["topics"]} for no, rows in batch.items() if rows["topics"]]
+    questions = [{"module_no": no, "questions": rows["questions"]} for no, rows in batch.items() if rows["questions"]]
+
+    with span("rpc:insert_subject_content", modules=len(batch)):
+        await repo.rpc(
+            "insert_subject_content",
+            {
+                "p_subject_id": subject_id,
+                "p_flashcards": flashcards,
+                "p_topics": topics,
+                "p_questions": questions
+            }
+        )
+
+    report["calls"] += 1
+    report["inserted"]["flashcards"] += len(flashcards)
+    report["inserted"]["topics"].extend(entry["module_no"] for entry in topics)
+    report["inserted"]["questions"].extend(entry["module_no"] for entry in questions)
+
+def is_missing_function(error: Exception) -> bool:
+    """Whether an RPC failed because the database function doesn't exist (PostgREST PGRST202)"""
+    return str(getattr(error, "code", "")) in ("PGRST202", "404")
+
+async def insert_batch_per_item(repo: SupabaseRepository, subject_id: str, batch: Dict[str, Dict[str, List]],
+                                report: Dict[str, Any], logger: logging.Logger):
+    """Fallback path: one RPC per content type and module, recording each failure"""
+    flashcards_list = [card for rows in batch.values() for card in rows["flashcards"]]
+    if flashcards_list:
+        try:
+            # Insert using RPC call
+            with span("rpc:insert_flashcards", rows=len(flashcards_list)):
+                await repo.rpc(
+                    "insert_flashcards",
+                    {
+                        "p_subject_id": subject_id,
+                        "p_flashcards": flashcards_list
+                    }
+                )
+            report["calls"] += 1
+            report["inserted"]["flashcards"] += len(flashcards_list)
+            logger.info(f"Successfully inserted {len(flashcards_list)} flashcards")
+        except Exception as e:
+            logger.error(f"Error inserting flashcards: {str(e)}")
+            report["failed"].append({"kind": "flashcards", "module_no": None, "error": str(e)})
+
+    for module_no, rows in batch.items():
+        if rows["topics"]:
             try:
-                # Convert flashcards to list format
-                flashcards_list = []
-                for module_key, cards in flashcards_dict.items():
-                    if isinstance(cards, list):
-                        for card in cards:
-                            if isinstance(card, dict):
-                                flashcards_list.append({
-                                    "question": str(card.get("question", "")),
-                                    "answer": str(card.get("answer", "")),
-                                    "module_no": str(module_key).replace("mod", "").strip()
-                                })
-                
-                if flashcards_list:
-                    # Insert using RPC call
-                    response = supabase.rpc(
-                        "insert_flashcards",
-                        {
-                            "p_subject_id": subject_id,
-                            "p_flashcards": flashcards_list
-                        }
-                    ).execute()
-                    logger.info(f"Successfully inserted {len(flashcards_list)} flashcards")
-            except Exception as e:
-                logger.error(f"Error inserting flashcards: {str(e)}")
-        
-        # Insert module topics
-        logger.info("Inserting module topics...")
-        for module_name, module_data in content.get("important_topics", {}).items():
-            # Extract module number from module name (e.g., 'mod1' -> '1')
-            module_no = module_name.replace('mod', '')
-            topics = module_data
-            
-            if topics:
-                try:
-                    response = supabase.rpc(
+                with span("rpc:insert_module_topics", module=module_no):
+                    await repo.rpc(
                         "insert_module_topics",
                         {
                             "p_subject_id": subject_id,
                             "p_module_no": module_no,
-                            "p_topics": topics
+                            "p_topics": rows["topics"]
                         }
-                    ).execute()
-                    logger.info(f"Successfully inserted topics for module {module_no}")
-                except Exception as e:
-                    logger.error(f"Error inserting topics for module {module_no}: {str(e)}")
-
-        # Insert module Q&A
-        logger.info("Inserting module Q&A...")
-        for module_name, questions in content.get("important_qna", {}).items():
-            # Extract module number
-            module_no = module_name.replace('mod', '')
-            
-            if questions:
-                try:
-                    # Convert questions to JSONB format
-                    questions_jsonb = [
-                        {
-                            "question": qa["question"],
-                            "answer": qa["answer"]
-                        } for qa in questions
-                    ]
-                    response = supabase.rpc(
+                    )
+                report["calls"] += 1
+                report["inserted"]["topics"].append(module_no)
+                logger.info(f"Successfully inserted topics for module {module_no}")
+            except Exception as e:
+                logger.error(f"Error inserting topics for module {module_no}: {str(e)}")
+                report["failed"].append({"kind": "topics", "module_no": module_no, "error": str(e)})
+
+        if rows["questions"]:
+            try:
+                with span("rpc:insert_module_questions", module=module_no):
+                    await repo.rpc(
                         "insert_module_questions",
                         {
                             "p_subject_id": subject_id,
                             "p_module_no": module_no,
-                            "p_questions": questions_jsonb
+                            "p_questions": rows["questions"]
                         }
-                    ).execute()
-                    logger.info(f"Successfully inserted Q&A for module {module_no}")
-                except Exception as e:
-                    logger.error(f"Error inserting Q&A for module {module_no}: {str(e)}")
+                    )
+                report["calls"] += 1
+                report["inserted"]["questions"].append(module_no)
+                logger.info(f"Successfully inserted Q&A for module {module_no}")
+            except Exception as e:
+                logger.error(f"Error inserting Q&A for module {module_no}: {str(e)}")
+                report["failed"].append({"kind": "questions", "module_no": module_no, "error": str(e)})
+
+async def insert_content_to_database(user_id: str, subject: str, content: Dict[str, Any], logger: logging.Logger,
+                                     repo: SupabaseRepository) -> Dict[str, Any]:
+    """
+    Insert generated flashcards, topics and questions for a subject.
+
+    Each batch of modules goes through the transactional insert_subject_content RPC
+    (usually a single call per job). Databases without that function get the per-module
+    RPCs instead; any other bulk failure is reported, not retried, since the transaction
+    may have committed before the error reached us.
+
+    Returns:
+        Dict[str, Any]: report of the calls made, what was inserted and what failed
+    """
+    try:
+        logger.info("=== Starting database insertion process ===")
+        
+        # Usually answered from the identity map filled in by handle_upload
+        subject_id = await repo.get_subject_id(user_id, subject)
+        if not subject_id:
+            logger.error(f"Subject not found for user {user_id}")
+            raise ValueError("Subject not found in database")
+
+        report = {
+            "method": "bulk",
+            "calls": 0,
+            "inserted": {"flashcards": 0, "topics": [], "questions": []},
+            "failed": []
+        }
+        batches = batch_modules(group_content_by_module(content), BULK_INSERT_MAX_ROWS)
+        logger.info(f"Inserting content for {sum(len(batch) for batch in batches)} modules in {len(batches)} bulk call(s)")
+
+        for batch in batches:
+            try:
+                await insert_batch_bulk(repo, subject_id, batch, report)
+            except Exception as e:
+                if not is_missing_function(e):
+                    # A timeout or dropped connection may come after the commit, so a retry could duplicate rows
+                    logger.error(f"Bulk insert failed: {str(e)}")
+                    report["failed"].extend(
+                        {"kind": "content", "module_no": module_no, "error": str(e)} for module_no in batch
+                    )
+                    continue
+                logger.warning(f"insert_subject_content is missing, falling back to per-module inserts: {str(e)}")
+                report["method"] = "per_item"
+                await insert_batch_per_item(repo, subject_id, batch, report, logger)
 
+        if report["failed"]:
+            logger.error(f"Database insertion finished with {len(report['failed'])} failed insert(s)")
         logger.info("=== Database insertion process completed ===")
-        return True
+        return report
 
     except Exception as e:
         logger.error(f"Error in database insertion process: {str(e)}")
         raise
 
 
-async def upload_file_to_storage(file_path: str, user_id: str, subject: str, logger: logging.Logger) -> Optional[str]:
+async def upload_file_to_storage(file_path: str, user_id: str, subject: str, logger: logging.Logger,
+                                 repo: SupabaseRepository, folder: Optional[str] = None) -> Optional[str]:
     """
     Upload a file to Supabase storage in the study_materials bucket.
     
@@ -237,6 +349,8 @@ async def upload_file_to_storage(file_path: str, user_id: str, subject: str, log
         user_id: User ID for the directory structure
         subject: Subject name for the directory structure
         logger: Logger instance for tracking operations
+        repo: Repository of the request that started the job
+        folder: Optional sub-directory under the subject directory
         
     Returns:
         Optional[str]: URL of the uploaded file if successful, None if file doesn't exist
@@ -251,38 +365,30 @@ async def upload_file_to_storage(file_path: str, user_id: str, subject: str, log
         filename = os.path.basename(file_path)
         
         # Create the storage path
-        storage_path = f"{user_id}/{subject}/{filename}"
+        storage_path = f"{user_id}/{subject}/{folder}/{filename}" if folder else f"{user_id}/{subject}/{filename}"
         
         logger.info(f"Starting upload of {filename} to storage path: {storage_path}")
         
-        # Read the file content
-        with open(file_path, 'rb') as file:
-            file_content = file.read()
-        
         # Get file extension and set content type
         file_extension = os.path.splitext(filename)[1].lower()
-        content_type = "application/json" if file_extension == '.json' else "application/octet-stream"
-        
-        try:
-            # Try to remove existing file first
-            supabase.storage.from_("study_materials").remove([storage_path])
-        except Exception:
-            # If file doesn't exist or other error, continue with upload
-            pass
+        content_types = {'.json': "application/json", '.gz': "application/gzip"}
+        content_type = content_types.get(file_extension, "application/octet-stream")
             
-        # Upload to Supabase storage
-        response = supabase.storage\
-            .from_("study_materials")\
-            .upload(
-                path=storage_path,
-                file=file_content,
-                file_options={"content-type": content_type}
-            )
+        # Stream to Supabase storage, overwriting any earlier version in the same request
+        with span("storage_upload", file=filename):
+            await repo.upload_file(storage_path, file_path, content_type)
+            if VERIFY_UPLOADS:
+                info = await repo.info(storage_path)
+                verify_transfer(
+                    storage_path,
+                    os.path.getsize(file_path),
+                    await asyncio.to_thread(file_md5, file_path),
+                    info.get("size"),
+                    etag_md5(info.get("etag"))
+                )
             
         # Get the public URL
-        file_url = supabase.storage\
-            .from_("study_materials")\
-            .get_public_url(storage_path)
+        file_url = repo.get_public_url(storage_path)
             
         logger.info(f"Successfully uploaded {filename} to storage")
         return file_url
@@ -292,36 +398,90 @@ async def upload_file_to_storage(file_path: str, user_id: str, subject: str, log
         raise
 
 
+async def save_output_shards(content: Dict[str, Any], output_dir: str, user_id: str, subject: str,
+                             logger: logging.Logger, repo: SupabaseRepository) -> Dict[str, Any]:
+    """
+    Write one gzipped shard per module plus a manifest, locally and to storage.
+
+    The manifest is uploaded last, so readers never see it point at a missing shard.
+
+    Returns:
+        Dict[str, Any]: the manifest
+    """
+    shards = split_output(content)
+    encoded = {module_key: encode_output(shard) for module_key, shard in shards.items()}
+    manifest = build_manifest(shards, encoded)
+
+    shard_dir = os.path.join(output_dir, SHARD_DIR)
+    cache = get_data_cache()
+    shard_paths = []
+    for entry in manifest["modules"]:
+        shard_path = os.path.join(shard_dir, entry["file"])
+        await asyncio.to_thread(cache.write_bytes, shard_path, encoded[entry["key"]])
+        shard_paths.append(shard_path)
+    manifest_path = os.path.join(shard_dir, MANIFEST_FILENAME)
+    await asyncio.to_thread(cache.write_bytes, manifest_path, json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+    # Shards of an earlier run that the new manifest no longer lists only take up cache space
+    current = {entry["file"] for entry in manifest["modules"]} | {MANIFEST_FILENAME}
+    for filename in os.listdir(shard_dir):
+        if filename not in current and not filename.startswith("."):
+            os.remove(os.path.join(shard_dir, filename))
+
+    logger.info(f"Uploading {len(shard_paths)} module shards for {subject}")
+    await asyncio.gather(*(
+        upload_file_to_storage(path, user_id, subject, logger, repo, folder=SHARD_DIR)
+        for path in shard_paths
+    ))
+    await upload_file_to_storage(manifest_path, user_id, subject, logger, repo, folder=SHARD_DIR)
+    return manifest
+
+
+async def save_question_index(pyq_files: List[str], questions_texts: List[str], output_dir: str, user_id: str,
+                              subject: str, logger: logging.Logger, repo: SupabaseRepository) -> Dict[str, Any]:
+    """
+    Parse the question papers into per-question records and store them as the subject's
+    question index, locally and to storage.
+
+    Returns:
+        Dict[str, Any]: the index
+    """
+    papers = [(os.path.basename(path), text) for path, text in zip(pyq_files, questions_texts)]
+    index = await asyncio.to_thread(build_question_index, papers)
+    logger.info(f"Indexed {len(index['questions'])} questions from {len(papers)} question papers")
+
+    index_path = os.path.join(output_dir, INDEX_FILENAME)
+    await asyncio.to_thread(
+        get_data_cache().write_bytes, index_path, json.dumps(index, ensure_ascii=False).encode("utf-8")
+    )
+    await upload_file_to_storage(index_path, user_id, subject, logger, repo)
+    return index
+
+
 '''------------------'''
 # Add status tracking
 file_processing_status = {}
 
-async def process_files_background(request: PostRequest, user_id: str):
+async def process_files_background(request: PostRequest, user_id: str, repo: SupabaseRepository):
     """Background task for processing uploaded files"""
+    stage_started = time.perf_counter()
+    trace = start_trace(f"{user_id}/{request.subject}")
+    # Keep this job's downloads and output from being evicted while it runs
+    cache = get_data_cache()
+    job_dir = os.path.join(Config.DATA_DIR, user_id, request.subject)
+    cache.pin(job_dir)
     try:
         file_processing_status[user_id] = {"status": "processing", "error": None}
         
         # Move existing upload_files logic here
         logger.info("=== Starting background processing ===")
         logger.info("=== Starting upload process ===")
-        logger.info(f"Verifying authentication for user request")
-        verification = await verify_auth(request.token)
-        if not verification.authenticated:
-            logger.warning("Authentication failed")
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid authentication credentials"
-            )
+        # user_id was verified by handle_upload's auth dependency
 
-        current_user = verification.user
-        logger.info(f"Authentication successful for user: {current_user.id}")
-        
-  
         # Define paths for different file categories
         paths = {
-            "notes": f"{current_user.id}/{request.subject}/notes",
-            "pyq": f"{current_user.id}/{request.subject}/pyq",
-            "syllabus": f"{current_user.id}/{request.subject}/syllabus"
+            "notes": f"{user_id}/{request.subject}/notes",
+            "pyq": f"{user_id}/{request.subject}/pyq",
+            "syllabus": f"{user_id}/{request.subject}/syllabus"
         }
         logger.info(f"Processing subject: {request.subject}")
 
@@ -343,13 +503,8 @@ async def process_files_background(request: PostRequest, user_id: str):
             try:
                 logger.info(f"Processing category: {key}")
                 logger.debug(f"Listing files from path: {path}")
-                response = supabase.storage.from_("study_materials").list(
-                    path=path,
-                    options={
-                        "limit": 100,
-                        "sortBy": {"column": "name", "order": "desc"}
-                    }
-                )
+                with span("list", category=key):
+                    response = await repo.list_files(path)
 
                 if response is None or len(response) == 0:
                     logger.info(f"No files found in {key} category")
@@ -358,22 +513,25 @@ async def process_files_background(request: PostRequest, user_id: str):
                 logger.info(f"Found {len(response)} files in {key} category")
 
                 # Create directory for saving files
-                save_dir = os.path.join(Config.DATA_DIR, current_user.id, request.subject, key)
+                save_dir = os.path.join(Config.DATA_DIR, user_id, request.subject, key)
                 os.makedirs(save_dir, exist_ok=True)
                 logger.debug(f"Created directory: {save_dir}")
 
                 for file in response:
                     try:
                         logger.info(f"Processing file: {file['name']}")
-                        url = supabase.storage.from_("study_materials").get_public_url(
-                            f"{path}/{file['name']}"
-                        )
+                        url = repo.get_public_url(f"{path}/{file['name']}")
                         file_urls[key].append(url)
                         logger.debug(f"Generated public URL: {url}")
 
-                        # Download the file
+                        # Download the file, unless this version of it is still cached locally
                         save_path = os.path.join(save_dir, file['name'])
-                        success = await download_file(url, save_path)
+                        version = storage_version(file)
+                        if cache.fresh(save_path, version):
+                            saved_files[key].append(save_path)
+                            logger.info(f"Using cached copy of {file['name']}")
+                            continue
+                        success = await download_file(url, save_path, repo, file)
                         if success:
                             saved_files[key].append(save_path)
                             logger.info(f"Successfully saved file to: {save_path}")
@@ -392,27 +550,24 @@ async def process_files_background(request: PostRequest, user_id: str):
                 )
 
 
+        stage_started = observe_stage("download", stage_started)
+
+        # Extraction and generation work is shared fairly between users; small jobs get a bigger share
+        job = start_job(user_id, uuid.uuid4().hex, classify_job(sum(len(files) for files in saved_files.values())))
+        logger.info(f"Scheduling job for user {user_id} as {job.priority}")
+
         # Process PDFs and generate content & store to database
         logger.info("=== Starting PDF processing and content generation ===")
         try:
-            # Process syllabus
-            logger.info("Processing syllabus files...")
-            if saved_files["syllabus"]:
-                syllabus_text = load_pdf(saved_files["syllabus"][0])  # Take the first syllabus file
-            else:
-                syllabus_text = ""
+            # Extract the syllabus (first file only), question papers and module notes together
+            logger.info("Processing syllabus, question papers and notes...")
+            syllabus_text, questions_texts, module_notes = await extract_job_texts(saved_files)
+            if not saved_files["syllabus"]:
                 logger.warning("No syllabus files found")
 
-            # Process question papers
-            logger.info("Processing question papers...")
-            questions_texts = [load_pdf(qf) for qf in saved_files["pyq"]]
             if not any(questions_texts):
                 logger.warning("No question papers could be read")
                 questions_texts = [""]  # Provide empty fallback
-
-            # Process module notes
-            logger.info("Processing notes...")
-            module_notes = load_module_notes(saved_files["notes"])
             
             if not syllabus_text:
                 logger.error("Failed to read syllabus file")
@@ -434,44 +589,63 @@ async def process_files_background(request: PostRequest, user_id: str):
                 #logger.error("Failed to read any module notes")
                 #raise HTTPException(status_code=500, detail="Failed to process module notes")
 
-            # Generate content
+            stage_started = observe_stage("extract", stage_started)
+
+            # Per-question records for later stages; the job goes on without them if this fails
+            output_dir = os.path.join(Config.DATA_DIR, user_id, request.subject)
+            try:
+                await save_question_index(saved_files["pyq"], questions_texts, output_dir, user_id,
+                                          request.subject, logger, repo)
+            except Exception as e:
+                logger.error(f"Error saving question index: {str(e)}")
+
+            # Generate content, checkpointing each finished call under the job directory
             logger.info("Generating content from processed PDFs")
-            generator = ContentGenerator()
-            content = generator.generate_all_content(
-                syllabus_text=syllabus_text,
-                questions_texts=questions_texts,
-                module_notes=module_notes  # Changed from notes_texts to module_notes
-            )
-            
-            # Save output to file
-            output_dir = os.path.join(Config.DATA_DIR, current_user.id, request.subject)
-            output_path = os.path.join(output_dir, "output.json")
-            
-            logger.info(f"Saving generated content to: {output_path}")
-            async with aiofiles.open(output_path, "w", encoding='utf-8') as f:
-                await f.write(json.dumps(content, indent=2, ensure_ascii=False))
+            def generate() -> Dict[str, Any]:
+                from model.src.generator.content_generator import ContentGenerator
+                generator = ContentGenerator()
+                return generator.generate_all_content(
+                    syllabus_text=syllabus_text,
+                    questions_texts=questions_texts,
+                    module_notes=module_notes,  # Changed from notes_texts to module_notes
+                    checkpoint_dir=output_dir
+                )
 
-            # Upload saved file to storage
+            with span("generate"):
+                # Off the event loop; the context copy carries the trace and the job's flow
+                content = await asyncio.to_thread(generate)
+            stage_started = observe_stage("generate", stage_started)
+            
+            # Save output as per-module shards; the full document is served as a view over them
+            logger.info(f"Saving generated content to: {os.path.join(output_dir, SHARD_DIR)}")
             try:
-                storage_url = await upload_file_to_storage(
-                    file_path=output_path,
-                    user_id=current_user.id,
+                await save_output_shards(
+                    content=content,
+                    output_dir=output_dir,
+                    user_id=user_id,
                     subject=request.subject,
-                    logger=logger
+                    logger=logger,
+                    repo=repo
                 )
             except Exception as e:
                 logger.error(f"Error uploading to storage: {str(e)}")
                 # Continue execution even if storage upload fails
+            response_cache.invalidate_prefix(output_key(user_id, request.subject))
+            stage_started = observe_stage("storage_upload", stage_started)
 
             # Insert content into database
             logger.info("Inserting generated content into database")
-            await insert_content_to_database(
-                user_id=current_user.id,
+            db_report = await insert_content_to_database(
+                user_id=user_id,
                 subject=request.subject,
                 content=content,
-                logger=logger
+                logger=logger,
+                repo=repo
             )
+            stage_started = observe_stage("db_insert", stage_started)
             
+            # Everything is stored, so a later upload must not resume from this run
+            GenerationCheckpoint(output_dir).clear()
             logger.info(f"Successfully saved and stored content for {request.subject}")
 
         except Exception as e:
@@ -488,48 +662,50 @@ async def process_files_background(request: PostRequest, user_id: str):
 
         logger.info("=== Upload process completed successfully ===")
 
-        file_processing_status[user_id] = {"status": "completed", "error": None}
+        file_processing_status[user_id] = {"status": "completed", "error": None, "db_insert": db_report}
         logger.info(f"Background processing completed for user {user_id}")
         
 
     except HTTPException as he:
+        JOB_FAILURES.inc()
         logger.error(f"HTTP Exception occurred: {str(he)}")
         raise he
     except Exception as e:
+        JOB_FAILURES.inc()
         logger.error(f"Background processing error: {str(e)}")
         file_processing_status[user_id] = {"status": "failed", "error": str(e)}
+    finally:
+        JOB_QUEUE_DEPTH.dec()
+        # Per-job trace file for a trace viewer, plus a per-stage summary on the job status
+        try:
+            trace_path = os.path.join(Config.DATA_DIR, user_id, request.subject, "trace.json")
+            trace.export(trace_path)
+            if user_id in file_processing_status:
+                file_processing_status[user_id]["trace"] = trace.summary()
+            logger.info(f"Wrote job trace to: {trace_path}")
+        except Exception as e:
+            logger.error(f"Failed to export job trace: {str(e)}")
+        # Pick up the checkpoint and trace sizes, then let the job's files be evicted again
+        cache.record_tree(job_dir)
+        cache.unpin(job_dir)
 
 @router.post("/upload")
 async def handle_upload(
     request: PostRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    current_user: UserData = Depends(get_current_user),
+    repo: SupabaseRepository = Depends(get_repository)
 ):
     """Quick-return upload endpoint that triggers background processing"""
     try:
-        verification = await verify_auth(request.token)
-        if not verification.authenticated:
-            raise HTTPException(status_code=401)
-        
-        current_user = verification.user
-        #user_id = verification.user.id  #current_user.id
-        background_tasks.add_task(process_files_background, request, current_user.id)
+        # The job shares this request's repository, so it reuses the subject lookup below
+        background_tasks.add_task(process_files_background, request, current_user.id, repo)
         
-        # Add subject to subjects table
+        # Add subject to subjects table and make it the user's current subject
         logger.info("=== Updating subjects table ===")
         try:
             logger.info(f"Checking if subject {request.subject} exists for user {current_user.id}")
-            existing_entry = supabase.table("subjects").select("*")\
-                .eq("user_id", current_user.id)\
-                .eq("subject_name", request.subject)\
-                .execute()
-
-            if not existing_entry.data:
-                logger.info("Subject not found, adding to subjects table")
-                supabase.table("subjects").insert({
-                    "user_id": current_user.id,
-                    "subject_name": request.subject
-                }).execute()
-                logger.info("Successfully added subject to table")
+            subject_id = await repo.ensure_subject(current_user.id, request.subject)
         except Exception as e:
             logger.error(f"Failed to insert subject: {str(e)}")
             raise HTTPException(
@@ -537,30 +713,9 @@ async def handle_upload(
                 detail=f"Failed to insert subject: {str(e)}"
             )
 
-        # Update user's current subject
         logger.info("=== Updating user's current subject ===")
         try:
-            # Get the subject_id
-            subject_response = supabase.table("subjects").select("id")\
-                .eq("user_id", current_user.id)\
-                .eq("subject_name", request.subject)\
-                .execute()
-            
-            if not subject_response.data:
-                logger.error("Subject ID not found")
-                raise ValueError("Subject not found in database")
-        
-            subject_id = subject_response.data[0]['id']
-            
-            # Update or insert into user_current_subject
-            supabase.rpc(
-                "upsert_user_current_subject",
-                {
-                    "p_user_id": current_user.id,
-                    "p_subject_id": subject_id,
-                    "p_subject_name": request.subject
-                }
-            ).execute()
+            await repo.set_current_subject(current_user.id, subject_id, request.subject)
             logger.info("Successfully updated user's current subject")
         except Exception as e:
             logger.error(f"Error updating user's current subject: {str(e)}")
@@ -569,6 +724,8 @@ async def handle_upload(
                 detail=f"Failed to update current subject: {str(e)}"
             )
 
+        # Background tasks only run once this response is sent
+        JOB_QUEUE_DEPTH.inc()
         return JSONResponse(
             status_code=202,
             content={
@@ -841,108 +998,168 @@ async def upload_files(request: PostRequest):
 
 '''
 
+@router.get("/current-subject", response_model=CurrentSubjectResponse)
 @router.post("/get-current-subject", response_model=CurrentSubjectResponse)
-async def get_current_subject(token: TokenSchema):
+async def get_current_subject(http_request: Request,
+                              current_user: UserData = Depends(get_current_user),
+                              repo: SupabaseRepository = Depends(get_repository)):
     try:
         logger.info("=== Getting current subject ===")
-        verification = await verify_auth(token)
-        if not verification.authenticated:
-            logger.warning("Authentication failed")
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-
-        current_user = verification.user
-        logger.info(f"Authentication successful for user: {current_user.id}")
-
-        response = supabase.table("user_current_subject")\
-            .select("subject_id, subject_name")\
-            .eq("user_id", current_user.id)\
-            .single()\
-            .execute()
-
-        if not response.data:
-            logger.info(f"No current subject found for user {current_user.id}")
-            return CurrentSubjectResponse()
+        cache_key = current_subject_key(current_user.id)
+        entry = response_cache.get(cache_key)
+        if entry is None:
+            current_subject = await repo.get_current_subject(current_user.id)
+
+            if not current_subject:
+                logger.info(f"No current subject found for user {current_user.id}")
+                body = CurrentSubjectResponse()
+            else:
+                logger.info("Successfully retrieved current subject")
+                body = CurrentSubjectResponse(
+                    subject_name=current_subject.get("subject_name"),
+                    subject_id=current_subject.get("subject_id")
+                )
+            entry = response_cache.put(cache_key, body.model_dump_json().encode("utf-8"))
 
-        logger.info("Successfully retrieved current subject")
-        return CurrentSubjectResponse(
-            subject_name=response.data.get("subject_name"),
-            subject_id=response.data.get("subject_id")
-        )
+        return cached_json_response(http_request, entry)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting current subject: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-        
-'''        
-@router.get("/current-subject")  #will havto make it a post to get the refresh tokens
-async def get_current_subject():
-    try:
-        logger.info("=== Getting current subject ===")
-        verification = await verify_auth()
-        if not verification.authenticated:
-            logger.warning("Authentication failed")
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-
-        current_user = verification.user
-        logger.info(f"Authentication successful for user: {current_user.id}")
 
-        response = supabase.table("user_current_subject")\
-            .select("subject_id, subject_name, last_accessed")\
-            .eq("user_id", current_user.id)\
-            .single()\
-            .execute()
+@router.post("/get-output-json")
+async def get_output_json(request: PostRequest, http_request: Request,
+                          current_user: UserData = Depends(get_current_user),
+                          repo: SupabaseRepository = Depends(get_repository)):
+    return await read_output_json(request.subject, http_request, current_user, repo)
 
-        if not response.data:
-            logger.info(f"No current subject found for user {current_user.id}")
-            return {"subject": None}
 
-        logger.info("Successfully retrieved current subject")
-        return {
-            "subject": response.data
-        }
+@router.get("/output-json")
+async def get_output_json_by_subject(subject: str, http_request: Request,
+                                     current_user: UserData = Depends(get_current_user),
+                                     repo: SupabaseRepository = Depends(get_repository)):
+    return await read_output_json(subject, http_request, current_user, repo)
 
-    except Exception as e:
-        logger.error(f"Error getting current subject: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
 
-'''
+async def load_output_manifest(user_id: str, subject: str, repo: SupabaseRepository) -> Optional[Dict[str, Any]]:
+    """The subject's shard manifest, or None for subjects stored as a single output file"""
+    cache_key = output_manifest_key(user_id, subject)
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        try:
+            data = await repo.download(f"{user_id}/{subject}/{SHARD_DIR}/{MANIFEST_FILENAME}")
+        except Exception as e:
+            logger.debug(f"No output manifest for {subject}: {str(e)}")
+            return None
+        entry = response_cache.put(cache_key, data)
+    return json.loads(entry.body.decode("utf-8"))
+
+
+async def load_output_shard(user_id: str, subject: str, module: Dict[str, Any], repo: SupabaseRepository) -> CachedBody:
+    """Gzipped shard for one manifest entry"""
+    cache_key = output_module_key(user_id, subject, module["key"])
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        data = await repo.download(f"{user_id}/{subject}/{SHARD_DIR}/{module['file']}")
+        entry = response_cache.put(cache_key, data, encoding="gzip")
+    return entry
+
+
+async def load_full_output(user_id: str, subject: str, repo: SupabaseRepository) -> bytes:
+    """Gzipped full document, merged from the shards or read from a single output file"""
+    manifest = await load_output_manifest(user_id, subject, repo)
+    if manifest is not None:
+        shards = await asyncio.gather(*(
+            load_output_shard(user_id, subject, module, repo) for module in manifest["modules"]
+        ))
+        return encode_output(merge_shards({
+            module["key"]: decode_output(shard.body) for module, shard in zip(manifest["modules"], shards)
+        }))
+
+    # Subjects processed before sharding have output.json.gz, or output.json before that
+    for filename in (OUTPUT_FILENAME, LEGACY_OUTPUT_FILENAME):
+        try:
+            response = await repo.download(f"{user_id}/{subject}/{filename}")
+        except Exception as e:
+            logger.debug(f"No {filename} for {subject}: {str(e)}")
+            continue
+        # Parse once to validate; the cache keeps the gzipped bytes
+        content = decode_output(response)
+        return response if response[:2] == GZIP_MAGIC else encode_output(content)
+    raise ValueError("No output file in storage")
 
 
-@router.post("/get-output-json")
-async def get_output_json(request: PostRequest):
+async def read_output_json(subject: str, http_request: Request, current_user: UserData,
+                           repo: SupabaseRepository) -> Response:
     try:
         logger.info("=== Getting output.json ===")
-        verification = await verify_auth(request.token)
-        if not verification.authenticated:
-            logger.warning("Authentication failed")
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-
-        current_user = verification.user
-        logger.info(f"Authentication successful for user: {current_user.id}")
-
-        # Construct the file path
-        file_path = f"{current_user.id}/{request.subject}/output.json"
+        cache_key = output_key(current_user.id, subject)
+        entry = response_cache.get(cache_key)
+        if entry is None:
+            try:
+                body = await load_full_output(current_user.id, subject, repo)
+                entry = response_cache.put(cache_key, body, encoding="gzip")
+                logger.info(f"Successfully retrieved output for {subject}")
 
-        try:
-            # Download the file from storage
-            response = supabase.storage.from_("study_materials").download(file_path)
-            
-            # Parse the JSON content
-            content = json.loads(response.decode('utf-8'))
-            
-            logger.info(f"Successfully retrieved output.json for {request.subject}")
-            return content
+            except Exception as e:
+                logger.error(f"Error retrieving output.json: {str(e)}")
+                raise HTTPException(status_code=404, detail="Output file not found")
 
-        except Exception as e:
-            logger.error(f"Error retrieving output.json: {str(e)}")
-            raise HTTPException(status_code=404, detail="Output file not found")
+        return cached_json_response(http_request, entry)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_output_json: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/output-json/modules")
+async def get_output_modules(subject: str, current_user: UserData = Depends(get_current_user),
+                             repo: SupabaseRepository = Depends(get_repository)):
+    """List the modules of a subject's generated content, with item counts per section"""
+    manifest = await load_output_manifest(current_user.id, subject, repo)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Output not found")
+    return {
+        "modules": [{"key": module["key"], "counts": module["counts"]} for module in manifest["modules"]]
+    }
+
+
+@router.get("/output-json/modules/{module_key}")
+async def get_output_module(module_key: str, subject: str, http_request: Request, section: Optional[str] = None,
+                            current_user: UserData = Depends(get_current_user),
+                            repo: SupabaseRepository = Depends(get_repository)):
+    """One module's shard, or a single section of it (topics, qna or flashcards)"""
+    if section is not None and section not in SECTIONS:
+        raise HTTPException(status_code=422, detail=f"section must be one of: {', '.join(SECTIONS)}")
+
+    cache_key = output_module_key(current_user.id, subject, module_key, section)
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        manifest = await load_output_manifest(current_user.id, subject, repo)
+        module = next((m for m in (manifest or {}).get("modules", []) if m["key"] == module_key), None)
+        if module is None:
+            raise HTTPException(status_code=404, detail="Module not found")
+        try:
+            shard = await load_output_shard(current_user.id, subject, module, repo)
+        except Exception as e:
+            logger.error(f"Error retrieving shard for {module_key}: {str(e)}")
+            raise HTTPException(status_code=404, detail="Module not found")
+        if section is None:
+            entry = shard
+        else:
+            items = decode_output(shard.body).get(section)
+            if items is None:
+                raise HTTPException(status_code=404, detail="Section not found")
+            entry = response_cache.put(cache_key, encode_output(items), encoding="gzip")
+
+    return cached_json_response(http_request, entry)
+
+
 def generate_module_flashcards(self, module_key: str, module_content: str, notes_text: str, 
                              existing_qa: List[Dict[str, str]] = None) -> List[Dict[str, str]]:
     try:
@@ -1,60 +1,26 @@
-import os
+import asyncio
+import hashlib
+import json
 import logging
-from fastapi import APIRouter, HTTPException
-from app.services.supabase_service import supabase
-from app.routers.auth import verify_auth
-from app.schemas.auth_schema import TokenSchema
+from fastapi import APIRouter, HTTPException, Depends
+from app.services.repository import SupabaseRepository, get_repository
+from app.routers.auth import get_current_user
+from app.schemas.auth_schema import TokenSchema, UserData
 from pydantic import BaseModel, UUID4
-from typing import List
-from datetime import datetime
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from os import getenv
-from dotenv import load_dotenv
-
-# Configure logging
-try:
-    # Create logs directory if it doesn't exist
-    os.makedirs('logs', exist_ok=True)
-
-    # Configure logging format
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-    # Setup file handler
-    file_handler = logging.FileHandler('logs/app.log')
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.INFO)
-
-    # Setup console handler  
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.INFO)
-
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-
-    # Add handlers if not already present
-    if not root_logger.handlers:
-        root_logger.addHandler(file_handler)
-        root_logger.addHandler(console_handler)
-
-    # Get module logger
-    logger = logging.getLogger(__name__)
-    logger.info("Logging initialized successfully")
-
-except Exception as e:
-    print(f"Failed to initialize logging: {str(e)}")
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    logger = logging.getLogger(__name__)
-    logger.error(f"Fallback logging configured due to error: {str(e)}")
+from typing import Any, Dict, List, Optional, Set, Tuple
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+# The Google API client is imported on first use, see app.services.warmup
+from app.services.google_calendar import calendar_clients, GOOGLE_API_ROOT
+
+# Handlers are set up once in app.utils.logging_config
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Google accepts at most 50 calls in one batch request
+CALENDAR_BATCH_LIMIT = 50
+
 class ScheduleResponse(BaseModel):
     id: UUID4
     subject_id: UUID4
@@ -70,45 +36,192 @@ class CalendarSyncRequest(BaseModel):
     subject_id: UUID4
     token: TokenSchema
 
+def schedule_event(schedule: Dict) -> Dict:
+    """Google Calendar event body for a schedule row"""
+    return {
+        'summary': schedule['title'],
+        'description': schedule['description'],
+        'start': {
+            'dateTime': schedule['start_time'],
+            'timeZone': 'UTC',
+        },
+        'end': {
+            'dateTime': schedule['end_time'],
+            'timeZone': 'UTC',
+        },
+        'reminders': {
+            'useDefault': True
+        }
+    }
+
+def parse_token_expiry(value: Optional[str]) -> Optional[datetime]:
+    """Stored timestamptz -> the naive UTC datetime google-auth expects"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc).replace(tzinfo=None)
+
+def schedule_sync_hash(schedule: Dict) -> str:
+    """Hash of the event body, so a sync can tell whether Google already has this version"""
+    return hashlib.sha256(json.dumps(schedule_event(schedule), sort_keys=True).encode("utf-8")).hexdigest()
+
+def plan_calendar_sync(schedules: List[Dict], schedule_ids: Set[str],
+                       event_ids: Dict[str, str]) -> Dict[str, List]:
+    """
+    Work needed to bring Google Calendar in line with the schedules.
+
+    Args:
+        schedules: rows that are unsynced or changed since the last sync
+        schedule_ids: ids of every schedule of the subject that still exists
+        event_ids: schedule id -> Google event id recorded by earlier syncs
+
+    Returns:
+        Dict with inserts [schedule], patches [(schedule, event_id)] and deletes [(schedule_id, event_id)]
+    """
+    plan = {"inserts": [], "patches": [], "deletes": []}
+    for schedule in schedules:
+        schedule_id = str(schedule['id'])
+        event_id = schedule.get('google_event_id') or event_ids.get(schedule_id)
+        if not event_id:
+            plan["inserts"].append(schedule)
+        elif schedule.get('sync_hash') != schedule_sync_hash(schedule):
+            plan["patches"].append((schedule, event_id))
+    for schedule_id, event_id in event_ids.items():
+        if schedule_id not in schedule_ids:
+            plan["deletes"].append((schedule_id, event_id))
+    return plan
+
+def run_calendar_batch(requests: List[Tuple[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """
+    Execute Calendar API requests, CALENDAR_BATCH_LIMIT per HTTP request.
+
+    Returns:
+        Tuple of {request_id: response} and {request_id: exception}
+    """
+    from google.auth.exceptions import RefreshError
+    from googleapiclient.http import BatchHttpRequest
+
+    responses, errors = {}, {}
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = exception
+        else:
+            responses[request_id] = response
+
+    for start in range(0, len(requests), CALENDAR_BATCH_LIMIT):
+        chunk = requests[start:start + CALENDAR_BATCH_LIMIT]
+        batch = BatchHttpRequest(callback=on_response, batch_uri=urljoin(GOOGLE_API_ROOT, "batch/calendar/v3"))
+        for request_id, api_request in chunk:
+            batch.add(api_request, request_id=request_id)
+        try:
+            batch.execute()
+        except RefreshError:
+            # Retrying can't fix revoked or expired authorization
+            raise
+        except Exception as batch_error:
+            logger.error(f"Calendar batch request failed: {str(batch_error)}")
+            for request_id, _ in chunk:
+                if request_id not in responses:
+                    errors.setdefault(request_id, batch_error)
+    return responses, errors
+
+def is_missing_event(error: Optional[Exception]) -> bool:
+    from googleapiclient.errors import HttpError
+    return isinstance(error, HttpError) and error.resp.status in (404, 410)
+
+def apply_calendar_sync(service, plan: Dict[str, List]) -> Dict[str, Any]:
+    """
+    Run a sync plan against Google Calendar.
+
+    Patches of events that were deleted on the Google side are retried as inserts,
+    and deletes of events that are already gone count as done.
+    """
+    events = service.events()
+    requests = [
+        (f"insert:{schedule['id']}", events.insert(calendarId='primary', body=schedule_event(schedule)))
+        for schedule in plan["inserts"]
+    ] + [
+        (f"patch:{schedule['id']}", events.patch(calendarId='primary', eventId=event_id, body=schedule_event(schedule)))
+        for schedule, event_id in plan["patches"]
+    ] + [
+        (f"delete:{schedule_id}", events.delete(calendarId='primary', eventId=event_id))
+        for schedule_id, event_id in plan["deletes"]
+    ]
+    responses, errors = run_calendar_batch(requests)
+
+    recreate = [schedule for schedule, _ in plan["patches"] if is_missing_event(errors.get(f"patch:{schedule['id']}"))]
+    if recreate:
+        retried, retry_errors = run_calendar_batch([
+            (f"patch:{schedule['id']}", events.insert(calendarId='primary', body=schedule_event(schedule)))
+            for schedule in recreate
+        ])
+        for request_id in retried:
+            errors.pop(request_id, None)
+        responses.update(retried)
+        errors.update(retry_errors)
+
+    result = {"synced": [], "deleted": [], "failed": []}
+    written = [("insert", "inserted", schedule) for schedule in plan["inserts"]] + \
+        [("patch", "updated", schedule) for schedule, _ in plan["patches"]]
+    for kind, action, schedule in written:
+        schedule_id = str(schedule['id'])
+        request_id = f"{kind}:{schedule_id}"
+        if request_id in responses:
+            result["synced"].append({
+                "schedule_id": schedule_id,
+                "google_event_id": responses[request_id]['id'],
+                "sync_hash": schedule_sync_hash(schedule),
+                "action": action
+            })
+        else:
+            result["failed"].append({"schedule_id": schedule_id, "error": str(errors.get(request_id))})
+    for schedule_id, _ in plan["deletes"]:
+        request_id = f"delete:{schedule_id}"
+        if request_id in responses or is_missing_event(errors.get(request_id)):
+            result["deleted"].append(schedule_id)
+        else:
+            result["failed"].append({"schedule_id": schedule_id, "error": str(errors.get(request_id))})
+    return result
+
 @router.post("/sync")
-async def sync_to_google_calendar(request: CalendarSyncRequest):
+async def sync_to_google_calendar(request: CalendarSyncRequest,
+                                  current_user: UserData = Depends(get_current_user),
+                                  repo: SupabaseRepository = Depends(get_repository)):
     try:
-        verification = await verify_auth(request.token)
-        if not verification.authenticated:
-            raise HTTPException(status_code=401, detail="Unauthorized")
 
-        current_user = verification.user
-        
         # Log token information (exclude sensitive parts)
         logger.info(f"Attempting calendar sync for user {current_user.id}")
         logger.debug("Token present: %s", bool(request.token.access_token))
         logger.debug("Refresh token present: %s", bool(request.token.refresh_token))
 
-        # 1. Fetch unsynced schedules from database
-        response = supabase.table("schedules")\
-            .select("*")\
-            .eq("created_by", current_user.id)\
-            .eq("subject_id", request.subject_id)\
-            .execute()
+        # 1. Work out what changed since the last sync of this subject
+        subject_id = str(request.subject_id)
+        state = await repo.get_calendar_sync_state(current_user.id, subject_id) or {}
+        event_ids = state.get("event_ids") or {}
+        # Without a watermark a synced row may have changed unseen, so fetch every row and
+        # let sync_hash pick the ones to patch
+        schedules = await repo.get_schedules(current_user.id, subject_id,
+                                             unsynced_only=bool(state.get("synced_through")),
+                                             changed_since=state.get("synced_through"))
+        # Existing ids are only needed to spot removed schedules
+        schedule_ids = set(map(str, await repo.get_schedule_ids(current_user.id, subject_id))) if event_ids else set()
+        plan = plan_calendar_sync(schedules, schedule_ids, event_ids)
 
-        if not response.data:
-            logger.info(f"No schedules found for user {current_user.id}")
+        if not any(plan.values()):
+            logger.info(f"Calendar already up to date for user {current_user.id}")
             return {
                 "success": True,
                 "message": "No schedules found to sync",
                 "synced_events": [],
                 "failed_events": []
             }
+        logger.info(f"Calendar sync plan: {len(plan['inserts'])} inserts, "
+                    f"{len(plan['patches'])} updates, {len(plan['deletes'])} deletes")
 
-        # 2. Prepare OAuth credentials
-        load_dotenv()
+        # 2. Get the user's cached Calendar client
+        from google.auth.exceptions import RefreshError
         token = request.token.access_token
         refresh_token = request.token.refresh_token
-        client_id = getenv('GOOGLE_CLIENT_ID')
-        client_secret = getenv('GOOGLE_CLIENT_SECRET')
-        token_uri = 'https://oauth2.googleapis.com/token'
-
-        SCOPES = ['https://www.googleapis.com/auth/calendar']
 
         try:
             # First validate the token format
@@ -120,112 +233,101 @@ async def sync_to_google_calendar(request: CalendarSyncRequest):
                     "error_code": "MISSING_TOKEN_INFO"
                 }
 
-            # Create credentials object
-            creds = Credentials(
-                token,
-                refresh_token=refresh_token,
-                token_uri=token_uri,
-                client_id=client_id,
-                client_secret=client_secret,
-                scopes=SCOPES
-            )
-
-            # Attempt to refresh token if needed
-            if not creds.valid:
-                if creds.expired:
-                    logger.info("Token expired, attempting refresh")
-                    try:
-                        # Use a separate Request object for refresh
-                        request_obj = Request()
-                        creds.refresh(request_obj)
-                        logger.info("Successfully refreshed token")
-                        
-                        # Consider saving the new tokens here
-                        new_access_token = creds.token
-                        new_refresh_token = creds.refresh_token
-                        
-                        # TODO: Update tokens in your database if needed
-                        # await update_user_tokens(current_user.id, new_access_token, new_refresh_token)
-                        
-                    except Exception as refresh_error:
-                        logger.error(f"Token refresh failed: {str(refresh_error)}")
-                        return {
-                            "success": False,
-                            "error": "Google Calendar authorization expired. Please reconnect your account.",
-                            "error_code": "TOKEN_REFRESH_FAILED",
-                            "error_details": str(refresh_error)
-                        }
-
-            # Create calendar service with validated credentials
+            client = calendar_clients.cached(current_user.id, refresh_token)
+            if client is None:
+                # A token refreshed by an earlier process is newer than the one the client sent
+                stored = await repo.get_google_tokens(current_user.id)
+                if stored and stored.get("refresh_token") == refresh_token:
+                    stored = (stored["access_token"], parse_token_expiry(stored.get("expiry")))
+                else:
+                    stored = None
+                client = calendar_clients.create(current_user.id, token, refresh_token, stored)
+            token_before = client.creds.token
+
+            def run_sync():
+                # No probe call: auth problems surface on the first real request, where
+                # the authorized HTTP client refreshes on 401 and retries
+                with client.lock:
+                    client.ensure_fresh()
+                    return apply_calendar_sync(client.service, plan)
+
             try:
-                service = build('calendar', 'v3', credentials=creds)
-                
-                # Test API access with a simple call
-                calendar_list = service.calendarList().list(maxResults=1).execute()
-                logger.info("Successfully validated Google Calendar access")
-                
-            except Exception as service_error:
-                logger.error(f"Failed to initialize calendar service: {str(service_error)}")
+                result = await asyncio.to_thread(run_sync)
+            except RefreshError as refresh_error:
+                calendar_clients.invalidate(current_user.id)
+                logger.error(f"Token refresh failed: {str(refresh_error)}")
                 return {
                     "success": False,
-                    "error": "Unable to access Google Calendar API. Please reconnect your account.",
-                    "error_code": "SERVICE_INITIALIZATION_FAILED",
-                    "error_details": str(service_error)
-                }
-
-            # Process events
-            synced_events = []
-            failed_events = []
-            
-            for schedule in response.data:
-                event = {
-                    'summary': schedule['title'],
-                    'description': schedule['description'],
-                    'start': {
-                        'dateTime': schedule['start_time'],
-                        'timeZone': 'UTC',
-                    },
-                    'end': {
-                        'dateTime': schedule['end_time'],
-                        'timeZone': 'UTC',
-                    },
-                    'reminders': {
-                        'useDefault': True
-                    }
+                    "error": "Google Calendar authorization expired. Please reconnect your account.",
+                    "error_code": "TOKEN_REFRESH_FAILED",
+                    "error_details": str(refresh_error)
                 }
 
+            if client.creds.token != token_before:
+                logger.info("Google access token was refreshed, storing it")
                 try:
-                    created_event = service.events().insert(
-                        calendarId='primary',
-                        body=event
-                    ).execute()
-
-                    # Update database with sync information
-                    supabase.table("schedules").update({
-                        "google_event_id": created_event['id'],
-                        "is_synced": True,
-                        "last_sync_at": datetime.now().isoformat()
-                    }).eq("id", schedule['id']).execute()
-
-                    synced_events.append({
-                        "schedule_id": schedule['id'],
-                        "google_event_id": created_event['id']
-                    })
-                    
-                    logger.info(f"Successfully synced schedule {schedule['id']}")
-                    
-                except Exception as event_error:
-                    logger.error(f"Failed to sync schedule {schedule['id']}: {str(event_error)}")
-                    failed_events.append({
-                        "schedule_id": schedule['id'],
-                        "error": str(event_error)
-                    })
+                    await repo.save_google_tokens(
+                        current_user.id,
+                        client.creds.token,
+                        client.creds.refresh_token,
+                        client.creds.expiry.replace(tzinfo=timezone.utc).isoformat() if client.creds.expiry else None
+                    )
+                except Exception as store_error:
+                    logger.error(f"Failed to store refreshed Google tokens: {str(store_error)}")
+
+            # The plan ran in batch requests; record the outcome in one call
+            synced_events, deleted_events, failed_events = result["synced"], result["deleted"], result["failed"]
+            logger.info(f"Synced {len(synced_events)} events, deleted {len(deleted_events)}, {len(failed_events)} failed")
+
+            # The watermark only moves when nothing failed, so failed rows are retried next time
+            changed_at = [str(schedule['updated_at']) for schedule in schedules if schedule.get('updated_at')]
+            synced_through = max(changed_at) if changed_at and not failed_events else None
+            try:
+                await repo.record_calendar_sync(
+                    current_user.id,
+                    subject_id,
+                    synced=[
+                        {"id": event["schedule_id"], "google_event_id": event["google_event_id"],
+                         "sync_hash": event["sync_hash"]}
+                        for event in synced_events
+                    ],
+                    deleted=deleted_events,
+                    synced_through=synced_through
+                )
+            except Exception as bulk_error:
+                logger.warning(f"Bulk sync update failed, updating schedules one by one: {str(bulk_error)}")
+                for event in list(synced_events):
+                    try:
+                        await repo.update_schedule(event["schedule_id"], {
+                            "google_event_id": event["google_event_id"],
+                            "sync_hash": event["sync_hash"],
+                            "is_synced": True,
+                            "last_sync_at": datetime.now().isoformat()
+                        })
+                    except Exception as update_error:
+                        logger.error(f"Failed to record sync of schedule {event['schedule_id']}: {str(update_error)}")
+                        synced_events.remove(event)
+                        failed_events.append({
+                            "schedule_id": event["schedule_id"],
+                            "error": str(update_error)
+                        })
+                event_ids = dict(event_ids, **{event["schedule_id"]: event["google_event_id"] for event in synced_events})
+                await repo.save_calendar_sync_state({
+                    "user_id": current_user.id,
+                    "subject_id": subject_id,
+                    "event_ids": {k: v for k, v in event_ids.items() if k not in deleted_events},
+                    "synced_through": state.get("synced_through")
+                })
 
+            for event in synced_events:
+                event.pop("sync_hash", None)
             return {
                 "success": len(failed_events) == 0,
                 "synced_events": synced_events,
+                "deleted_events": deleted_events,
                 "failed_events": failed_events,
                 "total_synced": len(synced_events),
+                "total_deleted": len(deleted_events),
                 "total_failed": len(failed_events)
             }
 
@@ -5,7 +5,7 @@ from app.schemas.auth_schema import UserData, TokenSchema
 class PostRequest(BaseModel):
     user_id: str
     subject: str  # Removed user_id since we'll get it from the token
-    token: TokenSchema
+    token: Optional[TokenSchema] = None  # Optional when sent as an Authorization: Bearer header
     #access_token: str
     #refresh_token: str
 class FileDetail(BaseModel):
@@ -0,0 +1,116 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from app.services.metrics import READ_CACHE_LOOKUPS
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    encoding: Optional[str] = None  # Content-Encoding the body is stored in
+
+
+class ResponseCache:
+    """
+    Byte-bounded LRU of serialized response bodies with content-hash ETags.
+
+    The cache is per process; entries are dropped explicitly when the data
+    behind them changes (see invalidate) or when the byte budget is exceeded.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        READ_CACHE_LOOKUPS.labels(key[0], "hit" if entry else "miss").inc()
+        return entry
+
+    def put(self, key: Hashable, body: bytes, encoding: Optional[str] = None) -> CachedBody:
+        entry = CachedBody(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"', encoding)
+        if len(body) > self.max_bytes:
+            # Still served with an ETag, just never kept
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+        return entry
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+
+    def invalidate_prefix(self, prefix: tuple):
+        """Drop every entry whose key starts with prefix, e.g. all cached views of one subject"""
+        with self._lock:
+            for key in [key for key in self._entries if key[:len(prefix)] == prefix]:
+                self._size -= len(self._entries.pop(key).body)
+
+
+def output_key(user_id: str, subject: str):
+    return ("output", user_id, subject)
+
+
+def output_manifest_key(user_id: str, subject: str):
+    return output_key(user_id, subject) + ("manifest",)
+
+
+def output_module_key(user_id: str, subject: str, module_key: str, section: str = None):
+    return output_key(user_id, subject) + ("module", module_key, section)
+
+
+def current_subject_key(user_id: str):
+    return ("current_subject", user_id)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+
+def cached_json_response(request: Request, entry: CachedBody) -> Response:
+    """Serve a cached JSON body, or a bodiless 304 if the client already has it"""
+    body, etag = entry.body, entry.etag
+    # no-cache: browsers keep the body but revalidate with If-None-Match every time
+    headers = {"Cache-Control": "private, no-cache"}
+    if entry.encoding == "gzip":
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_gzip(request):
+            headers["Content-Encoding"] = "gzip"
+        else:
+            # The identity representation needs its own strong ETag
+            body, etag = gzip.decompress(body), etag[:-1] + '-identity"'
+    headers["ETag"] = etag
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, Dict, NamedTuple, Optional, Tuple
+
+from model.src.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry(NamedTuple):
+    size: int
+    version: Optional[str]
+
+
+class DiskCache:
+    """
+    Byte-bounded LRU over the per-user job directories under Config.DATA_DIR.
+
+    Only files below <root>/<user_id>/ are managed; anything directly in the root (the
+    bundled sample PDFs) is left alone. Files are evicted least recently used first
+    once the budget is exceeded, except under directories pinned by in-flight jobs.
+    Files written through write_bytes or atomic_file are atomic (temp file + rename) and can carry a
+    source version, so an unchanged storage object doesn't have to be downloaded again.
+
+    Access order and versions live in memory; on startup the order is rebuilt from
+    file access/modification times and versions start out unknown.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._total = 0
+        self._lock = threading.RLock()
+        self._scan()
+
+    def _managed(self, path: str) -> bool:
+        relative = os.path.relpath(path, self.root)
+        return not relative.startswith("..") and os.sep in relative
+
+    def _scan(self):
+        found = []
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                user_dir = os.path.join(self.root, name)
+                if not os.path.isdir(user_dir):
+                    continue
+                for dirpath, _, filenames in os.walk(user_dir):
+                    for filename in filenames:
+                        path = os.path.join(dirpath, filename)
+                        try:
+                            stat = os.stat(path)
+                        except OSError:
+                            continue
+                        found.append((max(stat.st_atime, stat.st_mtime), path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = _Entry(size, None)
+            self._total += size
+        logger.info(f"Data cache at {self.root}: {len(self._entries)} files, {self._total} bytes")
+
+    # Bookkeeping
+
+    def _set(self, path: str, size: int, version: Optional[str]):
+        previous = self._entries.pop(path, None)
+        if previous:
+            self._total -= previous.size
+        self._entries[path] = _Entry(size, version)
+        self._total += size
+
+    def _drop(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry:
+            self._total -= entry.size
+
+    def record(self, path: str, version: Optional[str] = None):
+        """Account for a file written outside write_bytes, marking it most recently used"""
+        path = os.path.abspath(path)
+        if not self._managed(path):
+            return
+        with self._lock:
+            try:
+                self._set(path, os.path.getsize(path), version)
+            except OSError:
+                self._drop(path)
+        self.evict()
+
+    def record_tree(self, directory: str):
+        """Re-measure every file under directory, e.g. after a job appended to some of them"""
+        directory = os.path.abspath(directory)
+        with self._lock:
+            for path in [p for p in self._entries if p.startswith(directory + os.sep)]:
+                if not os.path.exists(path):
+                    self._drop(path)
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    entry = self._entries.get(path)
+                    try:
+                        size = os.path.getsize(path)
+                    except OSError:
+                        continue
+                    if entry is None or entry.size != size:
+                        self._set(path, size, entry.version if entry else None)
+        self.evict()
+
+    def touch(self, path: str):
+        """Mark a cached file as just used"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+
+    def fresh(self, path: str, version: Optional[str]) -> bool:
+        """Whether path is cached locally as exactly this version of its source"""
+        if version is None:
+            return False
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry.version != version or not os.path.exists(path):
+                return False
+            self._entries.move_to_end(path)
+            return True
+
+    # Writes
+
+    @staticmethod
+    def _open_temp(path: str) -> Tuple[BinaryIO, str]:
+        # Same directory as path, so the final rename can't cross filesystems
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        return os.fdopen(fd, "wb"), temp_path
+
+    def _commit(self, f: BinaryIO, temp_path: str, path: str, version: Optional[str]):
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(temp_path, path)
+        self.record(path, version)
+
+    @staticmethod
+    def _discard(f: BinaryIO, temp_path: str):
+        f.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    def write_bytes(self, path: str, data: bytes, version: Optional[str] = None):
+        """Atomically replace path with data, so readers never see a partial file"""
+        f, temp_path = self._open_temp(path)
+        try:
+            f.write(data)
+            self._commit(f, temp_path, path, version)
+        except BaseException:
+            self._discard(f, temp_path)
+            raise
+
+    @asynccontextmanager
+    async def atomic_file(self, path: str, version: Optional[str] = None) -> AsyncIterator[BinaryIO]:
+        """
+        Async counterpart of write_bytes for streamed writes: yields a temp file that
+        replaces path if the block succeeds and is deleted if it raises.
+        """
+        f, temp_path = await asyncio.to_thread(self._open_temp, path)
+        try:
+            yield f
+            await asyncio.to_thread(self._commit, f, temp_path, path, version)
+        except BaseException:
+            await asyncio.to_thread(self._discard, f, temp_path)
+            raise
+
+    # Pinning and eviction
+
+    def pin(self, directory: str):
+        """Keep everything under directory from being evicted until unpin; pins nest"""
+        directory = os.path.abspath(directory)
+        with self._lock:
+            self._pins[directory] = self._pins.get(directory, 0) + 1
+
+    def unpin(self, directory: str):
+        directory = os.path.abspath(directory)
+        with self._lock:
+            count = self._pins.get(directory, 0) - 1
+            if count > 0:
+                self._pins[directory] = count
+            else:
+                self._pins.pop(directory, None)
+        self.evict()
+
+    def _pinned(self, path: str) -> bool:
+        return any(path.startswith(directory + os.sep) for directory in self._pins)
+
+    def evict(self) -> int:
+        """Delete least recently used unpinned files until within budget; returns bytes freed"""
+        freed = 0
+        with self._lock:
+            if self._total <= self.max_bytes:
+                return 0
+            for path in list(self._entries):
+                if self._total <= self.max_bytes:
+                    break
+                if self._pinned(path):
+                    continue
+                size = self._entries[path].size
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not evict {path}: {e}")
+                    continue
+                self._drop(path)
+                freed += size
+                self._remove_empty_parents(os.path.dirname(path))
+        if freed:
+            logger.info(f"Evicted {freed} bytes from the data cache, {self._total} bytes in use")
+        return freed
+
+    def _remove_empty_parents(self, directory: str):
+        while directory != self.root and directory.startswith(self.root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            return {"files": len(self._entries), "bytes": self._total, "max_bytes": self.max_bytes}
+
+
+def storage_version(file: Dict) -> Optional[str]:
+    """Identify the version of a storage list entry; None if storage didn't say"""
+    metadata = file.get("metadata") or {}
+    tag = metadata.get("eTag") or file.get("updated_at") or metadata.get("lastModified")
+    if not tag:
+        return None
+    return f"{tag}:{metadata.get('size', '')}"
+
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_data_cache() -> DiskCache:
+    """The process-wide cache over Config.DATA_DIR, scanned on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache.root != os.path.abspath(Config.DATA_DIR):
+            started = time.perf_counter()
+            _cache = DiskCache(Config.DATA_DIR, Config.DATA_DIR_MAX_BYTES)
+            logger.debug(f"Data cache scan took {time.perf_counter() - started:.3f}s")
+        return _cache
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from urllib.parse import urljoin
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+# Both overridable so sync can run against a local stand-in server
+GOOGLE_API_ROOT = os.getenv("GOOGLE_API_ROOT", "https://www.googleapis.com/")
+GOOGLE_TOKEN_URI = os.getenv("GOOGLE_TOKEN_URI", "https://oauth2.googleapis.com/token")
+# Refresh this long before expiry, so a token never lapses in the middle of a sync
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class CalendarClient:
+    """A user's Credentials and Calendar service, plus a lock since the service's HTTP client isn't thread-safe"""
+
+    def __init__(self, creds, refresh_fingerprint: str):
+        from googleapiclient.discovery import build
+
+        self.creds = creds
+        self.refresh_fingerprint = refresh_fingerprint
+        self.service = build(
+            'calendar', 'v3',
+            credentials=creds,
+            client_options={"api_endpoint": urljoin(GOOGLE_API_ROOT, "calendar/v3/")}
+        )
+        self.lock = threading.Lock()
+
+    def ensure_fresh(self) -> bool:
+        """Refresh ahead of expiry; returns True if the access token changed"""
+        expiry = self.creds.expiry
+        if expiry is None or expiry - REFRESH_MARGIN > datetime.utcnow():
+            # Without a known expiry the token is tried as is; a 401 triggers a refresh on first use
+            return False
+        from google.auth.transport.requests import Request
+        self.creds.refresh(Request())
+        return True
+
+
+class CalendarClientCache:
+    """
+    Per-user Calendar clients, reused across syncs so credentials and the service
+    object (discovery document processing) are only built once per user.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._clients: "OrderedDict[str, CalendarClient]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(refresh_token: str) -> str:
+        return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+    def cached(self, user_id: str, refresh_token: str) -> Optional[CalendarClient]:
+        """
+        The user's cached client if it was built for this refresh token. A different
+        refresh token means the user reconnected their account.
+        """
+        with self._lock:
+            client = self._clients.get(user_id)
+            if client is None or client.refresh_fingerprint != self.fingerprint(refresh_token):
+                return None
+            self._clients.move_to_end(user_id)
+            return client
+
+    def create(self, user_id: str, access_token: str, refresh_token: str,
+               stored: Optional[Tuple[str, Optional[datetime]]] = None) -> CalendarClient:
+        """
+        Build and cache a client for these tokens. `stored` is a previously saved
+        (access_token, expiry) for the same refresh token, preferred over the
+        possibly stale token sent with the request.
+        """
+        from google.oauth2.credentials import Credentials
+
+        fingerprint = self.fingerprint(refresh_token)
+        token, expiry = stored if stored else (access_token, None)
+        creds = Credentials(
+            token,
+            refresh_token=refresh_token,
+            token_uri=GOOGLE_TOKEN_URI,
+            client_id=os.getenv('GOOGLE_CLIENT_ID'),
+            client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
+            scopes=SCOPES,
+            expiry=expiry
+        )
+        client = CalendarClient(creds, fingerprint)
+        with self._lock:
+            self._clients[user_id] = client
+            while len(self._clients) > self.max_entries:
+                self._clients.popitem(last=False)
+        return client
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._clients.pop(user_id, None)
+
+
+calendar_clients = CalendarClientCache(int(os.getenv("CALENDAR_CLIENT_CACHE_SIZE", "256")))
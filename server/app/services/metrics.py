@@ -0,0 +1,33 @@
+import time
+from prometheus_client import Counter, Gauge, Histogram
+
+REQUEST_LATENCY = Histogram(
+    "studygpt_request_duration_seconds",
+    "HTTP request latency, by method and route template",
+    ["method", "route", "status"]
+)
+JOB_STAGE_DURATION = Histogram(
+    "studygpt_job_stage_duration_seconds",
+    "Duration of each stage of an upload processing job",
+    ["stage"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+)
+JOB_FAILURES = Counter(
+    "studygpt_job_failures_total",
+    "Upload processing jobs that ended in an error"
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "studygpt_job_queue_depth",
+    "Upload processing jobs accepted but not yet finished"
+)
+READ_CACHE_LOOKUPS = Counter(
+    "studygpt_read_cache_lookups_total",
+    "Read-path cache lookups, by cached resource and hit or miss",
+    ["resource", "result"]
+)
+
+def observe_stage(stage: str, started: float) -> float:
+    """Record the time since `started` for a job stage and return a new start mark"""
+    now = time.perf_counter()
+    JOB_STAGE_DURATION.labels(stage).observe(now - started)
+    return now
@@ -0,0 +1,242 @@
+import asyncio
+import functools
+import hashlib
+import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from storage3.exceptions import StorageApiError
+
+from app.services.cache import response_cache, current_subject_key
+from app.services.supabase_service import supabase
+from app.utils.transfer import CHUNK_SIZE, ChecksumMismatch
+
+STORAGE_BUCKET = "study_materials"
+
+# The Supabase client is synchronous, so every call is offloaded to this bounded
+# pool. All calls share the client's underlying HTTP connection pool.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SUPABASE_POOL_SIZE", "16")),
+    thread_name_prefix="supabase"
+)
+
+
+class SupabaseRepository:
+    """
+    Non-blocking data access for one request (or the background job it starts).
+
+    Lookups that don't change during a request, such as subject IDs, are kept in
+    an identity map so repeated calls don't go back to the database.
+    """
+
+    def __init__(self, client=supabase):
+        self.client = client
+        self._subject_ids: Dict[Tuple[str, str], str] = {}
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+    # Subjects
+
+    async def get_subject_id(self, user_id: str, subject_name: str) -> Optional[str]:
+        key = (user_id, subject_name)
+        if key not in self._subject_ids:
+            response = await self._run(
+                self.client.table("subjects").select("id")
+                .eq("user_id", user_id)
+                .eq("subject_name", subject_name)
+                .execute
+            )
+            if not response.data:
+                return None
+            self._subject_ids[key] = response.data[0]["id"]
+        return self._subject_ids[key]
+
+    async def ensure_subject(self, user_id: str, subject_name: str) -> str:
+        """Return the subject's ID, creating the subject row if it doesn't exist yet"""
+        subject_id = await self.get_subject_id(user_id, subject_name)
+        if subject_id:
+            return subject_id
+
+        response = await self._run(
+            self.client.table("subjects").insert({
+                "user_id": user_id,
+                "subject_name": subject_name
+            }).execute
+        )
+        if not response.data:
+            raise ValueError("Subject could not be created")
+        self._subject_ids[(user_id, subject_name)] = response.data[0]["id"]
+        return self._subject_ids[(user_id, subject_name)]
+
+    async def set_current_subject(self, user_id: str, subject_id: str, subject_name: str):
+        await self.rpc("upsert_user_current_subject", {
+            "p_user_id": user_id,
+            "p_subject_id": subject_id,
+            "p_subject_name": subject_name
+        })
+        response_cache.invalidate(current_subject_key(user_id))
+
+    async def get_current_subject(self, user_id: str) -> Optional[Dict[str, Any]]:
+        response = await self._run(
+            self.client.table("user_current_subject")
+            .select("subject_id, subject_name")
+            .eq("user_id", user_id)
+            .single()
+            .execute
+        )
+        return response.data
+
+    # Schedules
+
+    async def get_schedules(self, user_id: str, subject_id: str, unsynced_only: bool = False,
+                            changed_since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """All of a subject's schedules, or only the unsynced ones plus any changed after changed_since"""
+        query = self.client.table("schedules").select("*")\
+            .eq("created_by", user_id)\
+            .eq("subject_id", subject_id)
+        if changed_since:
+            query = query.or_(f"is_synced.is.null,is_synced.eq.false,updated_at.gt.{changed_since}")
+        elif unsynced_only:
+            query = query.or_("is_synced.is.null,is_synced.eq.false")
+        response = await self._run(query.execute)
+        return response.data or []
+
+    async def get_schedule_ids(self, user_id: str, subject_id: str) -> List[str]:
+        response = await self._run(
+            self.client.table("schedules").select("id")
+            .eq("created_by", user_id)
+            .eq("subject_id", subject_id)
+            .execute
+        )
+        return [row["id"] for row in response.data or []]
+
+    async def update_schedule(self, schedule_id: str, changes: Dict[str, Any]):
+        await self._run(
+            self.client.table("schedules").update(changes).eq("id", schedule_id).execute
+        )
+
+    async def get_calendar_sync_state(self, user_id: str, subject_id: str) -> Optional[Dict[str, Any]]:
+        response = await self._run(
+            self.client.table("calendar_sync_state").select("*")
+            .eq("user_id", user_id)
+            .eq("subject_id", subject_id)
+            .execute
+        )
+        return response.data[0] if response.data else None
+
+    async def save_calendar_sync_state(self, state: Dict[str, Any]):
+        await self._run(self.client.table("calendar_sync_state").upsert(state).execute)
+
+    async def record_calendar_sync(self, user_id: str, subject_id: str, synced: List[Dict[str, str]],
+                                   deleted: List[str], synced_through: Optional[str]) -> int:
+        """Store event ids, hashes and the new watermark for one sync in a single call"""
+        response = await self.rpc("record_calendar_sync", {
+            "p_user_id": user_id,
+            "p_subject_id": subject_id,
+            "p_synced": synced,
+            "p_deleted": deleted,
+            "p_synced_through": synced_through
+        })
+        return response.data or 0
+
+    async def get_google_tokens(self, user_id: str) -> Optional[Dict[str, Any]]:
+        response = await self._run(
+            self.client.table("user_google_tokens").select("*").eq("user_id", user_id).execute
+        )
+        return response.data[0] if response.data else None
+
+    async def save_google_tokens(self, user_id: str, access_token: str, refresh_token: str,
+                                 expiry: Optional[str]):
+        await self._run(
+            self.client.table("user_google_tokens").upsert({
+                "user_id": user_id,
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "expiry": expiry
+            }).execute
+        )
+
+    # RPC
+
+    async def rpc(self, name: str, params: Dict[str, Any]):
+        return await self._run(self.client.rpc(name, params).execute)
+
+    # Storage
+
+    def _bucket(self):
+        return self.client.storage.from_(STORAGE_BUCKET)
+
+    async def list_files(self, path: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self._run(
+            self._bucket().list,
+            path=path,
+            options={
+                "limit": limit,
+                "sortBy": {"column": "name", "order": "desc"}
+            }
+        )
+
+    def get_public_url(self, path: str) -> str:
+        # Built locally by the client, no request is made
+        return self._bucket().get_public_url(path)
+
+    async def download(self, path: str) -> bytes:
+        return await self._run(self._bucket().download, path)
+
+    async def download_to(self, path: str, file: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Tuple[int, str]:
+        """Stream an object into an open binary file; returns its size and MD5 hex digest"""
+        return await self._run(self._download_to, path, file, chunk_size)
+
+    def _stream_object(self, path: str):
+        """
+        Open a streaming GET for an object, as a context manager yielding the httpx response.
+
+        storage3 only returns whole objects, so this goes through the bucket's own HTTP
+        client, which already carries the storage base URL and auth headers. That client is
+        private (SyncBucket._client), so this is the one place relying on it; written against
+        storage3 0.11.0, pinned in the requirements.
+        """
+        return self._bucket()._client.stream("GET", f"object/{STORAGE_BUCKET}/{urllib.parse.quote(path)}")
+
+    def _download_to(self, path: str, file: BinaryIO, chunk_size: int) -> Tuple[int, str]:
+        with self._stream_object(path) as response:
+            if response.is_error:
+                response.read()
+                error = response.json()
+                raise StorageApiError(error.get("message"), error.get("error"), error.get("statusCode"))
+            digest = hashlib.md5()
+            size = 0
+            for chunk in response.iter_bytes(chunk_size):
+                file.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            expected = response.headers.get("content-length")
+        if expected is not None and "content-encoding" not in response.headers and int(expected) != size:
+            raise ChecksumMismatch(f"{path}: connection closed after {size} of {expected} bytes")
+        return size, digest.hexdigest()
+
+    async def upload_file(self, path: str, local_path: str, content_type: str):
+        """Stream a local file to storage, replacing any existing object in the same request"""
+        def upload():
+            with open(local_path, "rb") as f:
+                return self._bucket().upload(
+                    path=path,
+                    file=f,
+                    file_options={"content-type": content_type, "upsert": "true"}
+                )
+        return await self._run(upload)
+
+    async def info(self, path: str) -> Dict[str, Any]:
+        """Stored size, ETag and other metadata of one object"""
+        return await self._run(self._bucket().info, path)
+
+    async def remove(self, paths: List[str]):
+        return await self._run(self._bucket().remove, paths)
+
+
+def get_repository() -> SupabaseRepository:
+    """FastAPI dependency giving each request its own repository and identity map"""
+    return SupabaseRepository()
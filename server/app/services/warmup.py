@@ -0,0 +1,68 @@
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use by the routers. Loading them takes a couple of seconds,
+# so they're kept out of app startup and preloaded here in the background instead.
+HEAVY_MODULES = [
+    "model.src.utils.pdf_utils",              # pdfminer
+    "model.src.generator.content_generator",  # openai, tiktoken, langchain, faiss
+    "googleapiclient.discovery",
+    "googleapiclient.http",
+    "google.oauth2.credentials",
+    "google.auth.transport.requests",
+]
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+_status: Dict[str, Optional[float]] = {"started": None, "finished": None}
+_failed: Dict[str, str] = {}
+
+
+def warm_up():
+    """Import the heavy modules and build shared resources so the first upload or calendar sync doesn't pay for them"""
+    _status["started"] = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # The request that needs the module will raise the same error
+            _failed[name] = str(e)
+            logger.warning(f"Warm-up could not import {name}: {e}")
+    try:
+        # Builds the shared OpenAI client and loads the tokenizer (which may download its BPE file)
+        from model.src.generator.resources import get_resources
+        get_resources()
+    except Exception as e:
+        _failed["generator_resources"] = str(e)
+        logger.warning(f"Warm-up could not create generator resources: {e}")
+    _status["finished"] = time.perf_counter()
+    logger.info(f"Warm-up finished in {_status['finished'] - _status['started']:.2f}s")
+
+
+def start_warmup() -> Optional[threading.Thread]:
+    """Run warm_up in a daemon thread so the server accepts requests straight away"""
+    if not WARMUP_ON_STARTUP:
+        return None
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_status() -> Dict:
+    started, finished = _status["started"], _status["finished"]
+    if started is None:
+        state = "disabled" if not WARMUP_ON_STARTUP else "pending"
+    else:
+        state = "done" if finished is not None else "running"
+    status = {"state": state}
+    if finished is not None:
+        status["seconds"] = round(finished - started, 3)
+    if _failed:
+        status["failed"] = dict(_failed)
+    return status
@@ -0,0 +1,70 @@
+import gzip
+import json
+import re
+from typing import Any, Dict
+
+# Generated content is stored as gzip-compressed compact JSON. Subjects processed
+# before the switch only have the plain, indented LEGACY_OUTPUT_FILENAME.
+OUTPUT_FILENAME = "output.json.gz"
+LEGACY_OUTPUT_FILENAME = "output.json"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def encode_output(content: Any) -> bytes:
+    """Compact JSON, gzipped with a fixed mtime so equal content gives equal bytes (and ETags)"""
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def decode_output(data: bytes) -> Any:
+    """Read either format; gzip is detected from its magic bytes, not the file name"""
+    if data[:2] == GZIP_MAGIC:
+        data = gzip.decompress(data)
+    return json.loads(data.decode("utf-8"))
+
+
+# Each module's topics, Q&A and flashcards are also stored as their own shard under
+# SHARD_DIR, listed in a manifest, so a client can fetch one module or section.
+SHARD_DIR = "output"
+MANIFEST_FILENAME = "manifest.json"
+SECTIONS = {"topics": "important_topics", "qna": "important_qna", "flashcards": "flashcards"}
+
+
+def split_output(content: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Regroup the full document by module: {module_key: {section: items}}"""
+    shards = {}
+    for section, field in SECTIONS.items():
+        for module_key, items in content.get(field, {}).items():
+            shards.setdefault(module_key, {})[section] = items
+    return shards
+
+
+def merge_shards(shards: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Inverse of split_output"""
+    content = {field: {} for field in SECTIONS.values()}
+    for module_key, shard in shards.items():
+        for section, field in SECTIONS.items():
+            if section in shard:
+                content[field][module_key] = shard[section]
+    return content
+
+
+def shard_filename(index: int, module_key: str) -> str:
+    # Module keys come from note file names, so keep only path-safe characters
+    safe_key = re.sub(r"[^A-Za-z0-9_-]", "_", module_key)
+    return f"{index:02d}_{safe_key}.json.gz"
+
+
+def build_manifest(shards: Dict[str, Dict[str, Any]], encoded: Dict[str, bytes]) -> Dict[str, Any]:
+    return {
+        "version": 1,
+        "modules": [
+            {
+                "key": module_key,
+                "file": shard_filename(index, module_key),
+                "bytes": len(encoded[module_key]),
+                "counts": {section: len(items) for section, items in shard.items()}
+            }
+            for index, (module_key, shard) in enumerate(shards.items())
+        ]
+    }
@@ -0,0 +1,38 @@
+import hashlib
+import os
+import re
+from typing import Optional
+
+# Bytes held in memory per storage transfer, whatever the object size
+CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", str(256 * 1024)))
+# Re-read an object's size and ETag after uploading it and compare with the local file
+VERIFY_UPLOADS = os.getenv("STORAGE_VERIFY_UPLOADS", "true").lower() in ("1", "true", "yes")
+
+_MD5_ETAG = re.compile(r'^(?:W/)?"?([0-9a-fA-F]{32})"?$')
+
+
+class ChecksumMismatch(Exception):
+    """A transferred object doesn't match its expected size or checksum"""
+
+
+def file_md5(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def etag_md5(etag: Optional[str]) -> Optional[str]:
+    """The MD5 an ETag stands for, or None for multipart-style and other opaque ETags"""
+    match = _MD5_ETAG.match(etag or "")
+    return match.group(1).lower() if match else None
+
+
+def verify_transfer(what: str, size: int, md5: str,
+                    expected_size: Optional[int] = None, expected_md5: Optional[str] = None):
+    """Raise ChecksumMismatch if size or md5 differ from whichever expectations are known"""
+    if expected_size is not None and int(expected_size) != size:
+        raise ChecksumMismatch(f"{what}: expected {expected_size} bytes, got {size}")
+    if expected_md5 is not None and expected_md5 != md5:
+        raise ChecksumMismatch(f"{what}: expected MD5 {expected_md5}, got {md5}")
@@ -0,0 +1,88 @@
+"""
+Import-time benchmark for the API process.
+
+Imports app.main in fresh interpreters and reports the median wall time, which of
+the heavy dependencies ended up loaded, and the packages that take longest to
+import according to `python -X importtime`. Run it before and after touching
+imports to see what startup pays for.
+
+Usage (from the server/ directory):
+    python -m benchmarks.import_benchmark --repeat 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+HEAVY_PACKAGES = [
+    "openai", "tiktoken", "langchain", "langchain_community", "faiss", "numpy",
+    "pdfminer", "googleapiclient", "google.oauth2", "prometheus_client", "supabase",
+]
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {packages!r} if name in sys.modules]}}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    # Keep the background warm-up out of the measurement
+    env["WARMUP_ON_STARTUP"] = "false"
+    return env
+
+
+def time_import(module: str, repeat: int) -> Tuple[float, List[str]]:
+    """Median seconds to import `module` in a fresh interpreter, and the heavy packages it pulled in"""
+    timings, loaded = [], []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, packages=HEAVY_PACKAGES)],
+            capture_output=True, text=True, env=_env(), check=True
+        )
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(sample["seconds"])
+        loaded = sample["loaded"]
+    return statistics.median(timings), loaded
+
+
+def slowest_imports(module: str, top: int) -> List[Tuple[int, str]]:
+    """Top-level packages with the most import time, summing `-X importtime` self times of their modules"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), check=True
+    )
+    totals: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    return sorted(((us, name) for name, us in totals.items()), reverse=True)[:top]
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="API import-time benchmark")
+    parser.add_argument("--module", default="app.main", help="module to import")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    args = parser.parse_args(argv)
+
+    seconds, loaded = time_import(args.module, args.repeat)
+    print(f"import {args.module}: median {seconds * 1000:.0f} ms over {args.repeat} runs")
+    print(f"heavy packages loaded: {', '.join(loaded) or 'none'}")
+    print(f"\n{'package':<28} {'self ms':>14}")
+    for us, name in slowest_imports(args.module, args.top):
+        print(f"{name:<28} {us / 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Offline end-to-end benchmark of the upload pipeline.
+
+Starts local OpenAI and Supabase stand-ins, seeds storage with the sample PDFs
+in model/data/pdf/, and drives /models/upload for a number of concurrent users.
+Reports wall time, per-stage time, call counts and tokens for each concurrency
+level so performance changes can be compared without real accounts.
+
+Usage (from the server/ directory):
+    python -m benchmarks.pipeline_benchmark --concurrency 1 2 4 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import jwt
+
+from benchmarks.stub_servers import OpenAIStub, SupabaseStub
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DIR = os.path.join(
+    SERVER_DIR, "model", "data", "pdf", "ebf213b0-06b1-48b3-bbcd-dc92de0ecb9c", "ostest"
+)
+JWT_SECRET = "benchmark-secret"
+STAGES = ["download", "extract", "generate", "storage_upload", "db_insert"]
+
+
+def configure_environment(openai_stub: OpenAIStub, supabase_stub: SupabaseStub):
+    """Point the app at the stubs; must run before any app module is imported"""
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": openai_stub.base_url,
+        "SUPABASE_URL": supabase_stub.url,
+        "SUPABASE_KEY": "benchmark-anon-key",
+        "SUPABASE_SECRET_KEY": jwt.encode({"role": "service_role"}, JWT_SECRET, algorithm="HS256"),
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+    })
+
+
+def seed_storage(supabase_stub: SupabaseStub, user_id: str, subject: str):
+    for category in ("notes", "pyq", "syllabus"):
+        category_dir = os.path.join(SAMPLE_DIR, category)
+        for name in sorted(os.listdir(category_dir)):
+            with open(os.path.join(category_dir, name), "rb") as f:
+                supabase_stub.put_object("study_materials", f"{user_id}/{subject}/{category}/{name}", f.read())
+
+
+def make_token(user_id: str) -> Dict[str, str]:
+    payload = {
+        "sub": user_id,
+        "email": f"{user_id}@benchmark.local",
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+    }
+    return {"access_token": jwt.encode(payload, JWT_SECRET, algorithm="HS256"), "refresh_token": "benchmark"}
+
+
+def stage_totals() -> Dict[str, float]:
+    from prometheus_client import REGISTRY
+    return {
+        stage: REGISTRY.get_sample_value("studygpt_job_stage_duration_seconds_sum", {"stage": stage}) or 0.0
+        for stage in STAGES
+    }
+
+
+def llm_token_totals() -> Dict[str, float]:
+    from prometheus_client import REGISTRY
+    totals = {}
+    for metric in REGISTRY.collect():
+        if metric.name != "studygpt_llm_tokens":
+            continue
+        for sample in metric.samples:
+            if sample.name.endswith("_total"):
+                task = sample.labels["task"]
+                totals[task] = totals.get(task, 0) + sample.value
+    return totals
+
+
+async def run_level(app, supabase_stub: SupabaseStub, openai_stub: OpenAIStub, concurrency: int, run_id: str) -> Dict:
+    import httpx
+
+    subject = "ostest"
+    users = [f"bench-{run_id}-{i}" for i in range(concurrency)]
+    for user_id in users:
+        seed_storage(supabase_stub, user_id, subject)
+
+    openai_stub.counters.reset()
+    supabase_stub.counters.reset()
+    stages_before = stage_totals()
+    tokens_before = llm_token_totals()
+
+    async def upload(user_id: str) -> float:
+        started = time.perf_counter()
+        # ASGITransport only returns once the background processing task has finished
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            response = await client.post("/models/upload", json={
+                "user_id": user_id,
+                "subject": subject,
+                "token": make_token(user_id),
+            })
+            response.raise_for_status()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    job_times = await asyncio.gather(*(upload(user_id) for user_id in users))
+    wall_time = time.perf_counter() - started
+
+    stages_after = stage_totals()
+    tokens_after = llm_token_totals()
+    return {
+        "concurrency": concurrency,
+        "wall_time": wall_time,
+        "job_times": job_times,
+        "stages": {stage: stages_after[stage] - stages_before[stage] for stage in STAGES},
+        "llm_tokens": {task: tokens_after[task] - tokens_before.get(task, 0) for task in tokens_after},
+        "openai": openai_stub.counters.snapshot(),
+        "supabase": supabase_stub.counters.snapshot(),
+    }
+
+
+def print_report(result: Dict):
+    jobs = result["job_times"]
+    print(f"\n=== concurrency {result['concurrency']} ===")
+    print(f"wall time           {result['wall_time']:8.2f}s")
+    print(f"jobs/minute         {len(jobs) / result['wall_time'] * 60:8.2f}")
+    print(f"job time min/max    {min(jobs):8.2f}s / {max(jobs):.2f}s")
+    print("stage time (summed over jobs)")
+    for stage, seconds in result["stages"].items():
+        print(f"  {stage:<17} {seconds:8.2f}s")
+    print("openai calls / stub tokens")
+    for name, calls in sorted(result["openai"]["calls"].items()):
+        print(f"  {name:<17} {calls:8d} / {result['openai']['tokens'][name]}")
+    print("recorded llm tokens")
+    for task, tokens in sorted(result["llm_tokens"].items()):
+        print(f"  {task:<17} {tokens:8.0f}")
+    print("supabase calls")
+    for name, calls in sorted(result["supabase"]["calls"].items()):
+        print(f"  {name:<30} {calls:5d}")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Offline upload pipeline benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4],
+                        help="numbers of simultaneous uploads to sweep")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per stub chat completion")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="seconds per stub embeddings call")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="seconds per stub table query or RPC")
+    args = parser.parse_args(argv)
+
+    openai_stub = OpenAIStub(latency=args.latency, embedding_latency=args.embedding_latency).start()
+    supabase_stub = SupabaseStub(latency=args.db_latency).start()
+    configure_environment(openai_stub, supabase_stub)
+
+    # Imported late so the app reads the stub configuration
+    from app.main import app
+    from model.src.config import Config
+
+    with tempfile.TemporaryDirectory(prefix="studygpt-bench-") as data_dir:
+        Config.DATA_DIR = data_dir
+        try:
+            for run_index, concurrency in enumerate(args.concurrency):
+                result = asyncio.run(run_level(app, supabase_stub, openai_stub, concurrency, str(run_index)))
+                print_report(result)
+        finally:
+            openai_stub.stop()
+            supabase_stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Local stand-ins for the OpenAI, Supabase and Google Calendar HTTP APIs used by the benchmarks.
+
+Each server keeps simple call and token counters so a benchmark run can report
+what the pipeline would have cost against the real services.
+"""
+import email.parser
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+EMBEDDING_DIM = 64
+
+
+class StubCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.tokens: Dict[str, int] = {}
+
+    def record(self, name: str, tokens: int = 0):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.tokens[name] = self.tokens.get(name, 0) + tokens
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {"calls": dict(self.calls), "tokens": dict(self.tokens)}
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.tokens.clear()
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _StubServer:
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self):
+        self.counters = StubCounters()
+        handler = type("Handler", (self.handler_class,), {"stub": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_bytes(body, "application/json", status)
+
+    def send_bytes(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _OpenAIHandler(_JSONHandler):
+    def do_POST(self):
+        request = json.loads(self.read_body() or b"{}")
+        if self.path.endswith("/chat/completions"):
+            self.chat_completion(request)
+        elif self.path.endswith("/embeddings"):
+            self.embeddings(request)
+        else:
+            self.send_json({"error": {"message": f"Unknown path {self.path}"}}, 404)
+
+    def chat_completion(self, request: Dict):
+        time.sleep(self.stub.latency)
+        prompt = "\n".join(m["content"] for m in request["messages"])
+        task, content = self.stub.fake_completion(prompt)
+        prompt_tokens = _approx_tokens(prompt)
+        completion_tokens = _approx_tokens(content)
+        self.stub.counters.record(f"chat:{task}", prompt_tokens + completion_tokens)
+        self.send_json({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    def embeddings(self, request: Dict):
+        time.sleep(self.stub.embedding_latency)
+        inputs = request["input"]
+        if isinstance(inputs, (str, int)) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = []
+        tokens = 0
+        for index, item in enumerate(inputs):
+            text = item if isinstance(item, str) else " ".join(map(str, item))
+            tokens += len(item) if isinstance(item, list) else _approx_tokens(text)
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            vector = [(digest[i % len(digest)] - 128) / 128.0 for i in range(EMBEDDING_DIM)]
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        self.stub.counters.record("embeddings", tokens)
+        self.send_json({
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "stub"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+
+class OpenAIStub(_StubServer):
+    """OpenAI-compatible chat/embeddings server with configurable latency"""
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, latency: float = 0.0, embedding_latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.embedding_latency = embedding_latency
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    @staticmethod
+    def fake_completion(prompt: str):
+        """Return a (task, content) pair shaped like what each prompt asks for"""
+        qa = [{"question": f"Stub question {i}?", "answer": f"Stub answer {i}."} for i in range(5)]
+        topics = [f"Stub topic {i}" for i in range(5)]
+        if "covering every one of these modules:" in prompt:
+            keys = prompt.split("covering every one of these modules:")[1].splitlines()[0].split(",")
+            return "packed", json.dumps({
+                key.strip(): {"topics": topics, "qa": qa, "flashcards": qa} for key in keys
+            })
+        if '"topics":' in prompt:
+            return "combined", json.dumps({"topics": topics, "qa": qa})
+        if "flashcard" in prompt:
+            return "flashcards", json.dumps(qa)
+        if "topic names" in prompt:
+            return "topics", json.dumps(topics)
+        return "qa", json.dumps(qa)
+
+
+class _SupabaseHandler(_JSONHandler):
+    OBJECT_PATH = re.compile(r"^/storage/v1/object/(?:public/)?([^/]+)/(.+)$")
+    INFO_PATH = re.compile(r"^/storage/v1/object/info/([^/]+)/(.+)$")
+
+    def route(self):
+        parsed = urllib.parse.urlparse(self.path)
+        return urllib.parse.unquote(parsed.path), urllib.parse.parse_qs(parsed.query)
+
+    def do_GET(self):
+        path, query = self.route()
+        if path.startswith("/rest/v1/"):
+            return self.select(path[len("/rest/v1/"):], query)
+        match = self.INFO_PATH.match(path)
+        if match:
+            self.stub.counters.record("storage:info")
+            data = self.stub.objects.get(f"{match.group(1)}/{match.group(2)}")
+            if data is None:
+                return self.send_json({"statusCode": "404", "error": "not_found", "message": "Object not found"}, 404)
+            return self.send_json({
+                "name": match.group(2),
+                "size": len(data),
+                "etag": f'"{hashlib.md5(data).hexdigest()}"'
+            })
+        match = self.OBJECT_PATH.match(path)
+        if match:
+            self.stub.counters.record("storage:download")
+            data = self.stub.objects.get(f"{match.group(1)}/{match.group(2)}")
+            if data is None:
+                return self.send_json({"statusCode": "404", "error": "not_found", "message": "Object not found"}, 404)
+            return self.send_bytes(data, "application/octet-stream")
+        self.send_json({"message": f"Unknown path {path}"}, 404)
+
+    def do_HEAD(self):
+        path, _ = self.route()
+        match = self.OBJECT_PATH.match(path)
+        data = self.stub.objects.get(f"{match.group(1)}/{match.group(2)}") if match else None
+        self.send_response(200 if data is not None else 404)
+        self.send_header("Content-Length", str(len(data or b"")))
+        if data is not None:
+            self.send_header("ETag", f'"{hashlib.md5(data).hexdigest()}"')
+        self.end_headers()
+
+    def do_POST(self):
+        path, query = self.route()
+        body = self.read_body()
+        if path.startswith("/rest/v1/rpc/"):
+            name = path[len("/rest/v1/rpc/"):]
+            self.stub.counters.record(f"rpc:{name}")
+            time.sleep(self.stub.latency)
+            return self.send_json(self.stub.rpc(name, json.loads(body or b"{}")))
+        if path.startswith("/rest/v1/"):
+            return self.insert(path[len("/rest/v1/"):], json.loads(body or b"[]"))
+        if path.startswith("/storage/v1/object/list/"):
+            self.stub.counters.record("storage:list")
+            request = json.loads(body or b"{}")
+            return self.send_json(self.stub.list_objects(path.rsplit("/", 1)[1], request.get("prefix", "")))
+        match = self.OBJECT_PATH.match(path)
+        if match:
+            self.stub.counters.record("storage:upload")
+            key = f"{match.group(1)}/{match.group(2)}"
+            if key in self.stub.objects and self.command == "POST" and self.headers.get("x-upsert") != "true":
+                return self.send_json({"statusCode": "409", "error": "Duplicate", "message": "The resource already exists"}, 400)
+            self.stub.objects[key] = self.stub.extract_upload(
+                body, self.headers.get("Content-Type", "")
+            )
+            return self.send_json({"Key": f"{match.group(1)}/{match.group(2)}"})
+        self.send_json({"message": f"Unknown path {path}"}, 404)
+
+    def do_PUT(self):
+        self.do_POST()
+
+    def do_DELETE(self):
+        path, _ = self.route()
+        request = json.loads(self.read_body() or b"{}")
+        bucket = path.rsplit("/", 1)[1]
+        self.stub.counters.record("storage:remove")
+        removed = []
+        for prefix in request.get("prefixes", []):
+            if self.stub.objects.pop(f"{bucket}/{prefix}", None) is not None:
+                removed.append({"name": prefix})
+        self.send_json(removed)
+
+    def do_PATCH(self):
+        path, query = self.route()
+        table = path[len("/rest/v1/"):]
+        self.stub.counters.record(f"table:{table}:update")
+        changes = json.loads(self.read_body() or b"{}")
+        rows = self.stub.filter_rows(table, query)
+        for row in rows:
+            row.update(changes)
+        self.send_json(rows)
+
+    def select(self, table: str, query: Dict[str, List[str]]):
+        self.stub.counters.record(f"table:{table}:select")
+        time.sleep(self.stub.latency)
+        rows = self.stub.filter_rows(table, query)
+        if "vnd.pgrst.object" in (self.headers.get("Accept") or ""):
+            if len(rows) != 1:
+                return self.send_json({"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned"}, 406)
+            return self.send_json(rows[0])
+        self.send_json(rows)
+
+    def insert(self, table: str, payload):
+        self.stub.counters.record(f"table:{table}:insert")
+        rows = payload if isinstance(payload, list) else [payload]
+        for row in rows:
+            row.setdefault("id", hashlib.sha1(json.dumps(row, sort_keys=True).encode()).hexdigest()[:16])
+            self.stub.tables.setdefault(table, []).append(row)
+        self.send_json(rows, 201)
+
+
+class SupabaseStub(_StubServer):
+    """In-memory storage, PostgREST table and RPC server"""
+
+    handler_class = _SupabaseHandler
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.objects: Dict[str, bytes] = {}
+        self.tables: Dict[str, List[Dict]] = {}
+
+    def put_object(self, bucket: str, path: str, data: bytes):
+        self.objects[f"{bucket}/{path}"] = data
+
+    def list_objects(self, bucket: str, prefix: str) -> List[Dict]:
+        prefix = f"{bucket}/{prefix.rstrip('/')}/"
+        return [
+            {"name": key[len(prefix):], "id": key,
+             "metadata": {"size": len(data), "eTag": f'"{hashlib.md5(data).hexdigest()}"'}}
+            for key, data in sorted(self.objects.items())
+            if key.startswith(prefix) and "/" not in key[len(prefix):]
+        ]
+
+    def filter_rows(self, table: str, query: Dict[str, List[str]]) -> List[Dict]:
+        rows = self.tables.get(table, [])
+        for column, values in query.items():
+            if column in ("select", "order", "limit", "offset"):
+                continue
+            for value in values:
+                if column == "or":
+                    # or=(col.op.value,...) with eq, gt and is.null conditions
+                    conditions = [c.split(".", 2) for c in value.strip("()").split(",")]
+                    rows = [row for row in rows if any(self.matches(row, *c) for c in conditions)]
+                elif value.startswith(("eq.", "gt.")):
+                    rows = [row for row in rows if self.matches(row, column, value[:2], value[3:])]
+        return rows
+
+    @staticmethod
+    def matches(row: Dict, column: str, operator: str, value: str) -> bool:
+        if operator == "is" and value == "null":
+            return row.get(column) is None
+        cell = row.get(column)
+        if operator == "gt":
+            return cell is not None and str(cell) > value
+        return (str(cell).lower() if isinstance(cell, bool) else str(cell)) == value
+
+    def rpc(self, name: str, params: Dict):
+        if name == "upsert_user_current_subject":
+            rows = self.tables.setdefault("user_current_subject", [])
+            rows[:] = [row for row in rows if row.get("user_id") != params.get("p_user_id")]
+            rows.append({
+                "user_id": params.get("p_user_id"),
+                "subject_id": params.get("p_subject_id"),
+                "subject_name": params.get("p_subject_name")
+            })
+        elif name == "record_calendar_sync":
+            synced = {u["id"]: u for u in params.get("p_synced", [])}
+            for row in self.tables.get("schedules", []):
+                if row.get("id") in synced and row.get("created_by") == params.get("p_user_id"):
+                    row.update(google_event_id=synced[row["id"]]["google_event_id"],
+                               sync_hash=synced[row["id"]]["sync_hash"], is_synced=True)
+            states = self.tables.setdefault("calendar_sync_state", [])
+            key = {"user_id": params["p_user_id"], "subject_id": params["p_subject_id"]}
+            state = next((row for row in states if all(row.get(k) == v for k, v in key.items())), None)
+            if state is None:
+                state = dict(key, event_ids={}, synced_through=None)
+                states.append(state)
+            state["event_ids"].update({i: u["google_event_id"] for i, u in synced.items()})
+            for schedule_id in params.get("p_deleted", []):
+                state["event_ids"].pop(schedule_id, None)
+            state["synced_through"] = params.get("p_synced_through") or state["synced_through"]
+            return len(synced)
+        return None
+
+    @staticmethod
+    def extract_upload(body: bytes, content_type: str) -> bytes:
+        """Pull the file part out of a multipart upload, or take a raw body as is"""
+        if "multipart/form-data" not in content_type:
+            return body
+        boundary = content_type.split("boundary=")[1].encode()
+        for part in body.split(b"--" + boundary):
+            header, _, data = part.partition(b"\r\n\r\n")
+            if b'name="file"' in header:
+                return data[:-2] if data.endswith(b"\r\n") else data
+        return b""
+
+
+class _GoogleCalendarHandler(_JSONHandler):
+    def do_GET(self):
+        self.handle_api("GET")
+
+    def do_POST(self):
+        route = urllib.parse.urlparse(self.path).path
+        if route.startswith("/batch/"):
+            return self.batch()
+        if route == "/token":
+            self.read_body()
+            return self.send_json(self.stub.issue_token())
+        self.handle_api("POST")
+
+    def do_PATCH(self):
+        self.handle_api("PATCH")
+
+    def do_DELETE(self):
+        self.handle_api("DELETE")
+
+    def handle_api(self, method: str):
+        body = self.read_body()
+        status, payload = self.stub.call(method, self.path, json.loads(body) if body else None,
+                                         authorization=self.headers.get("Authorization"))
+        if status == 204:
+            self.send_bytes(b"", "application/json", 204)
+        else:
+            self.send_json(payload, status)
+
+    def batch(self):
+        """Answer a multipart/mixed batch by running each embedded request in order"""
+        time.sleep(self.stub.latency)
+        self.stub.counters.record("batch")
+        content_type = self.headers.get("Content-Type", "")
+        message = email.parser.Parser().parsestr(
+            f"Content-Type: {content_type}\r\n\r\n" + self.read_body().decode("utf-8")
+        )
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition("\n")
+            head, _, body = rest.replace("\r\n", "\n").partition("\n\n")
+            headers = dict(line.split(": ", 1) for line in head.splitlines() if ": " in line)
+            authorization = next((v for k, v in headers.items() if k.lower() == "authorization"), None)
+            method, path, _ = request_line.strip().split(" ", 2)
+            status, payload = self.stub.call(method, path, json.loads(body) if body.strip() else None,
+                                             batched=True, authorization=authorization)
+            response_body = "" if status == 204 else json.dumps(payload)
+            content_id = " ".join(part["Content-ID"].split())  # undo header folding
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:]}\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\n\r\n{response_body}\r\n"
+            )
+        self.send_bytes(("".join(parts) + f"--{boundary}--\r\n").encode("utf-8"),
+                        f"multipart/mixed; boundary={boundary}")
+
+
+class GoogleCalendarStub(_StubServer):
+    """Calendar v3 events and batch endpoint; point GOOGLE_API_ROOT at `root_url`"""
+
+    handler_class = _GoogleCalendarHandler
+    EVENT_PATH = re.compile(r"^/calendar/v3/calendars/([^/]+)/events(?:/([^/?]+))?")
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.events: Dict[str, Dict] = {}
+        # Access tokens answered with 401, to exercise refresh on first use
+        self.expired_tokens = set()
+        self._lock = threading.Lock()
+
+    @property
+    def root_url(self) -> str:
+        return f"{self.url}/"
+
+    def issue_token(self) -> Dict:
+        self.counters.record("token")
+        return {"access_token": f"stub-token-{uuid.uuid4().hex}", "expires_in": 3600, "token_type": "Bearer"}
+
+    def call(self, method: str, path: str, body, batched: bool = False, authorization: str = None):
+        """Apply one Calendar API request; returns (status, payload)"""
+        if not batched:
+            time.sleep(self.latency)
+        if authorization and authorization.split(" ")[-1] in self.expired_tokens:
+            self.counters.record("unauthorized")
+            return 401, {"error": {"code": 401, "message": "Invalid Credentials"}}
+        route = urllib.parse.urlparse(path).path
+        if route.startswith("/calendar/v3/users/me/calendarList"):
+            self.counters.record("calendarList.list")
+            return 200, {"items": [{"id": "primary"}]}
+        match = self.EVENT_PATH.match(route)
+        if not match:
+            return 404, {"error": {"code": 404, "message": f"Unknown path {route}"}}
+        event_id = match.group(2)
+        with self._lock:
+            if method == "POST":
+                self.counters.record("events.insert")
+                event_id = uuid.uuid4().hex
+                self.events[event_id] = dict(body or {}, id=event_id)
+                return 200, self.events[event_id]
+            if event_id not in self.events:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if method == "PATCH":
+                self.counters.record("events.patch")
+                self.events[event_id].update(body or {})
+                return 200, self.events[event_id]
+            if method == "DELETE":
+                self.counters.record("events.delete")
+                del self.events[event_id]
+                return 204, None
+            self.counters.record("events.get")
+            return 200, self.events[event_id]
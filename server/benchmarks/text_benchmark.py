@@ -0,0 +1,113 @@
+"""
+Microbenchmarks for the CPU-bound text processing that runs before any network call.
+
+Times extract_text_from_pdf on the bundled OS/DBMS/COA PDFs, then extract_modules,
+ContentGenerator.chunk_content / truncate_text / count_tokens and the
+RecursiveCharacterTextSplitter step of VectorStore.initialize on the extracted
+text scaled up synthetically. Each row reports the median time over the repeats
+and the peak memory allocated during one call, so regressions show up as numbers.
+
+Usage (from the server/ directory):
+    python -m benchmarks.text_benchmark --scales 1 4 16 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+# The generator builds an OpenAI client on init; nothing here calls it
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from model.src.config import Config
+from model.src.utils.pdf_utils import extract_text_from_pdf
+from model.src.utils.text_utils import extract_modules
+
+PDF_FILES = {
+    "syllabus": ["OS Syllabus .pdf", "DBMS Syllabus.pdf", "COA Syllabus.pdf"],
+    "pyq": ["OS Jan 2024.pdf", "OS June 2023.pdf", "coaqp1.pdf"],
+    "notes": ["OS Mod 3.pdf", "OS Mod 5.pdf", "mod1.pdf"],
+}
+
+
+def measure(func: Callable, repeat: int, setup: Callable = None) -> Dict[str, float]:
+    """Median wall time over `repeat` runs plus peak traced allocation of one run"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_ms": statistics.median(timings) * 1000, "peak_kib": peak / 1024}
+
+
+def print_row(name: str, size: str, stats: Dict[str, float]):
+    print(f"{name:<34} {size:>12} {stats['median_ms']:12.2f} {stats['peak_kib']:12.1f}")
+
+
+def bench_pdf_extraction(repeat: int) -> Dict[str, str]:
+    texts = {}
+    for category, names in PDF_FILES.items():
+        for name in names:
+            path = os.path.join(Config.DATA_DIR, name)
+            if not os.path.exists(path):
+                continue
+            texts[name] = extract_text_from_pdf(path) or ""
+            size = f"{os.path.getsize(path) // 1024}KiB"
+            print_row(f"extract_text_from_pdf[{category}]", size,
+                      measure(lambda: extract_text_from_pdf(path), repeat))
+    return texts
+
+
+def bench_text_paths(texts: Dict[str, str], scales: List[int], repeat: int):
+    from model.src.generator.content_generator import ContentGenerator
+    from model.src.rag.vector_store import VectorStore
+
+    generator = ContentGenerator()
+    splitter = VectorStore().text_splitter
+    syllabus = "\n".join(texts.get(name, "") for name in PDF_FILES["syllabus"])
+    corpus = "\n".join(texts.values())
+
+    for scale in scales:
+        syllabus_text = syllabus * scale
+        corpus_text = corpus * scale
+        syllabus_size = f"{len(syllabus_text) // 1024}KiB"
+        corpus_size = f"{len(corpus_text) // 1024}KiB"
+
+        print_row("extract_modules", syllabus_size,
+                  measure(lambda: extract_modules(syllabus_text), repeat))
+        print_row("chunk_content", corpus_size,
+                  measure(lambda: generator.chunk_content(corpus_text, generator.max_chunk_size), repeat))
+        print_row("truncate_text", corpus_size,
+                  measure(lambda: generator.truncate_text(corpus_text, generator.max_chunk_size // 2), repeat))
+        # Clear the memo so every run measures real tokenization
+        print_row("count_tokens", corpus_size,
+                  measure(lambda: generator.count_tokens(corpus_text), repeat,
+                          setup=generator._token_count_cache.clear))
+        print_row("text_splitter.split_text", corpus_size,
+                  measure(lambda: splitter.split_text(corpus_text), repeat))
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Text processing microbenchmarks")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4, 16],
+                        help="how many times to repeat the extracted text for the synthetic inputs")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement")
+    args = parser.parse_args(argv)
+
+    print(f"{'function':<34} {'input':>12} {'median ms':>12} {'peak KiB':>12}")
+    texts = bench_pdf_extraction(args.repeat)
+    bench_text_paths(texts, args.scales, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
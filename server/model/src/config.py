@@ -1,12 +1,62 @@
+import math
 import os
+from typing import Dict
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Priority classes of scheduled work, see model.src.utils.scheduling
+PRIORITY_CLASSES = ("interactive", "standard", "bulk")
+
+
+def check_scheduler_weights(weights: Dict[str, float]) -> Dict[str, float]:
+    """Require a positive, finite weight for every priority class and no others"""
+    unknown = set(weights) - set(PRIORITY_CLASSES)
+    if unknown:
+        raise ValueError(f"Unknown priority classes in scheduler weights: {', '.join(sorted(unknown))}")
+    missing = set(PRIORITY_CLASSES) - set(weights)
+    if missing:
+        raise ValueError(f"Scheduler weights missing for: {', '.join(sorted(missing))}")
+    for name, weight in weights.items():
+        # A class without credit would never be served, and its worker would spin holding the lock
+        if not (math.isfinite(weight) and weight > 0):
+            raise ValueError(f"Scheduler weight for {name} must be a positive number, got {weight}")
+    return weights
+
+
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    # Lets the benchmarks point the OpenAI clients at a local stand-in server
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
     MODEL_NAME = "gpt-4"
+    # Prompt plus completion tokens MODEL_NAME accepts per request
+    MODEL_CONTEXT_WINDOW = int(os.getenv("MODEL_CONTEXT_WINDOW", "8192"))
     MAX_TOKENS = 6000
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
-    DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "pdf")
\ No newline at end of file
+    # "separate" sends one topics and one QA request per chunk, "combined" a single request for both
+    GENERATION_MODE = os.getenv("GENERATION_MODE", "separate")
+    # Modules up to this many tokens are packed into shared requests; 0 disables packing
+    PACK_TOKEN_BUDGET = int(os.getenv("PACK_TOKEN_BUDGET", "0"))
+    # "llm" asks the model for topics, "tfidf" ranks syllabus topics by past questions without
+    # LLM calls, "prerank" asks the model to choose among the top-ranked syllabus topics
+    TOPIC_RANKING = os.getenv("TOPIC_RANKING", "llm")
+    PRERANK_CANDIDATES = int(os.getenv("PRERANK_CANDIDATES", "15"))
+    # Worker pools shared by every generation job in the process
+    LLM_WORKERS = int(os.getenv("LLM_WORKERS", "16"))
+    FLASHCARD_WORKERS = int(os.getenv("FLASHCARD_WORKERS", "8"))
+    TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "4096"))
+    EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "4"))
+    # Share of the pools each priority class gets per round, as "class:weight,..."
+    SCHEDULER_WEIGHTS = check_scheduler_weights({
+        name.strip(): float(weight)
+        for name, weight in (
+            item.split(":") for item in os.getenv("SCHEDULER_WEIGHTS", "interactive:4,standard:2,bulk:1").split(",")
+        )
+    })
+    # Upload jobs up to this many files are interactive, from BULK_JOB_MIN_FILES on they are bulk
+    SMALL_JOB_MAX_FILES = int(os.getenv("SMALL_JOB_MAX_FILES", "5"))
+    BULK_JOB_MIN_FILES = int(os.getenv("BULK_JOB_MIN_FILES", "15"))
+    DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "pdf")
+    # Downloads and job output under DATA_DIR/<user_id>/ are evicted LRU beyond this many bytes
+    DATA_DIR_MAX_BYTES = int(os.getenv("DATA_DIR_MAX_BYTES", str(5 * 1024**3)))
\ No newline at end of file
@@ -0,0 +1,114 @@
+# checkpoint.py
+from typing import Any, Dict, Iterable, Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+
+
+class GenerationCheckpoint:
+    """Append-only record of finished LLM calls for a single generation job.
+
+    Every completed chunk or flashcard result is written as one JSON line under
+    the job directory, so a job that dies half way can be restarted and only
+    issue the calls that are still missing. The first line records a digest of the
+    job's inputs; a checkpoint left by a job with other inputs (say, corrected notes
+    for the same subject) is discarded rather than resumed.
+    """
+
+    FILENAME = "checkpoint.jsonl"
+
+    def __init__(self, job_dir: str, inputs: Optional[str] = None):
+        self.path = os.path.join(job_dir, self.FILENAME)
+        self.inputs = inputs
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Any] = {}
+        os.makedirs(job_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def _digest(*parts: str) -> str:
+        digest = hashlib.sha1()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @classmethod
+    def inputs_digest(cls, syllabus_text: str, questions_texts: Iterable[str], module_notes: Dict[str, str],
+                      *settings: str) -> str:
+        """Digest of everything a job's LLM calls depend on besides the request itself"""
+        notes = [part for key in sorted(module_notes) for part in (key, module_notes[key] or "")]
+        return cls._digest("inputs", syllabus_text, *(text or "" for text in questions_texts), "notes", *notes,
+                           "settings", *settings)
+
+    @classmethod
+    def chunk_key(cls, chunk_data: Dict) -> str:
+        """Key for a process_chunk call, stable across restarts"""
+        return cls._digest(
+            "chunk",
+            str(chunk_data.get("type")),
+            str(chunk_data.get("module_key")),
+            str(chunk_data.get("num_pairs", "")),
+            chunk_data["chunk"],
+        )
+
+    @classmethod
+    def pack_key(cls, modules: Dict[str, str]) -> str:
+        """Key for a packed multi-module request"""
+        parts = []
+        for module_key, module_content in modules.items():
+            parts.extend([module_key, module_content])
+        return cls._digest("pack", *parts)
+
+    @classmethod
+    def flashcard_key(cls, module_key: str, module_content: str) -> str:
+        """Key for a generate_module_flashcards call"""
+        return cls._digest("flashcards", module_key, module_content)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                header = None
+            # Without inputs to compare, e.g. to clear() a finished job, any checkpoint is kept
+            if self.inputs is not None and (not isinstance(header, dict) or header.get("inputs") != self.inputs):
+                logging.info(f"Discarding checkpoint {self.path} left by a job with other inputs")
+                f.close()
+                os.remove(self.path)
+                return
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = entry["result"]
+                except (ValueError, KeyError):
+                    # A crash mid-write can leave a truncated last line
+                    logging.warning(f"Skipping unreadable checkpoint line in {self.path}")
+        if self._entries:
+            logging.info(f"Loaded {len(self._entries)} checkpointed results from {self.path}")
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._entries.get(key)
+
+    def save(self, key: str, result: Any):
+        line = json.dumps({"key": key, "result": result}, ensure_ascii=False)
+        with self._lock:
+            self._entries[key] = result
+            header = not os.path.exists(self.path)
+            with open(self.path, "a", encoding="utf-8") as f:
+                if header:
+                    f.write(json.dumps({"inputs": self.inputs}) + "\n")
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        """Drop the checkpoint once the job has been fully stored"""
+        with self._lock:
+            self._entries.clear()
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -1,27 +1,40 @@
 # content_generator.py
-from typing import Dict, List
+from typing import Dict, List, Optional, Set
 import json
 import logging
-from openai import OpenAI
-import tiktoken
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed, wait, FIRST_COMPLETED
 from model.src.config import Config
 from model.src.utils.text_utils import extract_modules
+from model.src.utils.syllabus import parse_syllabus
+from model.src.utils.question_paper import parse_question_paper, question_lines
+from model.src.utils.metrics import record_llm_usage, LLM_ERRORS, LLM_EMPTY_RESULTS
+from model.src.utils.tracing import span, in_current_context
 from model.src.rag.vector_store import VectorStore
-from .prompts import TOPIC_PROMPT, QA_PROMPT, FLASHCARD_PROMPT
+from model.src.rag.topic_ranker import TopicRanker
+from .checkpoint import GenerationCheckpoint
+from .resources import GeneratorResources, get_resources
+from .packer import COMPLETION_TOKENS_PER_MODULE, max_pack_modules, pack_modules, split_packed_response
+from .prompts import TOPIC_PROMPT, QA_PROMPT, COMBINED_PROMPT, PACKED_PROMPT, PACKED_MODULE_PROMPT, FLASHCARD_PROMPT
+
+PACKED_SYSTEM_MESSAGE = ("You are an expert educator identifying key educational topics "
+                         "and creating focused Q&A content and flashcards.")
 
 class ContentGenerator:
-    def __init__(self):
+    def __init__(self, resources: Optional[GeneratorResources] = None):
         try:
-            # Initialize OpenAI client
-            self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+            # Clients, tokenizer and worker pools are shared across jobs
+            self.resources = resources or get_resources()
+            self.client = self.resources.client
             
             # Initialize model configuration
             self.model = Config.MODEL_NAME
-            self.encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+            self.encoding = self.resources.encoding
             
-            # Initialize vector store
-            self.vector_store = VectorStore()
+            # Each job indexes its own documents
+            self.vector_store = VectorStore(
+                embeddings=self.resources.embeddings,
+                text_splitter=self.resources.text_splitter
+            )
             
             # Set configuration parameters
             self.max_context_length = 7000
@@ -30,9 +43,11 @@ class ContentGenerator:
             self.max_qna = 5
             self.flashcards_per_module = 5
             
-            # Initialize caches
-            self._token_count_cache = {}
+            # Token counts don't depend on the job, retrieved context does
+            self._token_count_cache = self.resources.token_counts
             self._context_cache = {}
+            self.syllabus_tree = None
+            self.topic_ranker: Optional[TopicRanker] = None
             
             logging.info("ContentGenerator initialized successfully")
             
@@ -41,15 +56,19 @@ class ContentGenerator:
             raise
 
     def count_tokens(self, text: str) -> int:
-        if text not in self._token_count_cache:
+        count = self._token_count_cache.get(text)
+        if count is None:
             try:
-                self._token_count_cache[text] = len(self.encoding.encode(text))
+                count = len(self.encoding.encode(text))
             except Exception as e:
                 logging.error(f"Error counting tokens: {str(e)}")
                 return 0
-        return self._token_count_cache[text]
+            self._token_count_cache.put(text, count)
+        return count
 
     def truncate_text(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
         tokens = self.encoding.encode(text)
         if len(tokens) > max_tokens:
             return self.encoding.decode(tokens[:max_tokens])
@@ -84,8 +103,17 @@ class ContentGenerator:
             self._context_cache[cache_key] = context
         return self._context_cache[cache_key]
 
+    @staticmethod
+    def empty_result(chunk_type: str):
+        """Fallback result for a chunk whose request failed"""
+        if chunk_type == 'topics':
+            return []
+        if chunk_type == 'combined':
+            return {'topics': [], 'qa': []}
+        return [{"question": "", "answer": ""}]
+
     def process_chunk(self, chunk_data: Dict) -> Dict:
-        """Process a single chunk for either topics or QA pairs"""
+        """Process a single chunk for topics, QA pairs, or both in one combined request"""
         chunk = chunk_data['chunk']
         chunk_type = chunk_data['type']
         module_key = chunk_data.get('module_key')
@@ -98,9 +126,13 @@ class ContentGenerator:
             chunk = self.truncate_text(chunk, self.max_chunk_size // 2)
 
             # Calculate available tokens
-            system_message = ("You are an expert in identifying key educational topics." 
-                            if chunk_type == 'topics' else 
-                            "You are an expert educator creating focused Q&A content.")
+            if chunk_type == 'topics':
+                system_message = "You are an expert in identifying key educational topics."
+            elif chunk_type == 'combined':
+                system_message = ("You are an expert educator identifying key educational topics "
+                                  "and creating focused Q&A content.")
+            else:
+                system_message = "You are an expert educator creating focused Q&A content."
             
             system_tokens = self.count_tokens(system_message)
             
@@ -111,6 +143,13 @@ class ContentGenerator:
                     content=chunk,
                     context=context
                 )
+            elif chunk_type == 'combined':
+                prompt = COMBINED_PROMPT.format(
+                    module_key=module_key,
+                    num_pairs=num_pairs,
+                    content=chunk,
+                    context=context
+                )
             else:  # QA pairs
                 prompt = QA_PROMPT.format(
                     num_pairs=num_pairs,
@@ -123,18 +162,27 @@ class ContentGenerator:
             prompt = self.truncate_text(prompt, available_tokens)
 
             # Make the API call
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
+            with span(f"llm:{chunk_type}", "llm", module=module_key):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=1500 if chunk_type == 'combined' else 1000
+                )
+            record_llm_usage(chunk_type, response.usage)
 
             # Parse and return results
             result = json.loads(response.choices[0].message.content)
+            if chunk_type == 'combined':
+                # Keep the shape the aggregation expects even if the model drops a key
+                result = {'topics': result.get('topics', []), 'qa': result.get('qa', [])}
+                if not result['topics'] and not result['qa']:
+                    LLM_EMPTY_RESULTS.labels(chunk_type).inc()
+            elif not result:
+                LLM_EMPTY_RESULTS.labels(chunk_type).inc()
             return {
                 'type': chunk_type,
                 'module_key': module_key,
@@ -142,11 +190,13 @@ class ContentGenerator:
             }
 
         except Exception as e:
+            LLM_ERRORS.labels(chunk_type).inc()
             print(f"Error in process_chunk: {str(e)}")
             return {
                 'type': chunk_type,
                 'module_key': module_key,
-                'result': [] if chunk_type == 'topics' else [{"question": "", "answer": ""}]
+                'result': self.empty_result(chunk_type),
+                'error': str(e)
             }
 
     def generate_module_flashcards(self, module_key: str, module_content: str, notes_text: str, 
@@ -180,30 +230,117 @@ class ContentGenerator:
             Module content: {module_content}
             Additional context: {context}"""
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert in creating educational flashcards."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
+            with span("llm:flashcards", "llm", module=module_key):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": "You are an expert in creating educational flashcards."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=1000
+                )
+            record_llm_usage('flashcards', response.usage)
 
-            flashcards = json.loads(response.choices[0].message.content)
-            return [
-                {
-                    "question": str(card.get("question", "")),
-                    "answer": str(card.get("answer", "")),
-                    "module_number": module_key.replace("mod", "").strip()
-                }
-                for card in flashcards
-                if isinstance(card, dict) and "question" in card and "answer" in card
-            ]
+            flashcards = self.format_flashcards(module_key, json.loads(response.choices[0].message.content))
+            if not flashcards:
+                LLM_EMPTY_RESULTS.labels('flashcards').inc()
+            return flashcards
 
         except Exception as e:
+            LLM_ERRORS.labels('flashcards').inc()
             return []
 
+    @staticmethod
+    def format_flashcards(module_key: str, flashcards: List) -> List[Dict[str, str]]:
+        return [
+            {
+                "question": str(card.get("question", "")),
+                "answer": str(card.get("answer", "")),
+                "module_number": module_key.replace("mod", "").strip()
+            }
+            for card in flashcards
+            if isinstance(card, dict) and "question" in card and "answer" in card
+        ]
+
+    def process_pack(self, pack_data: Dict) -> Dict:
+        """Generate topics, QA pairs and flashcards for several small modules in one request"""
+        module_keys = pack_data['module_keys']
+        try:
+            # Leave room for one topics/QA/flashcards block per module in the completion, then
+            # split what the window has left between the modules; the instructions are never cut
+            completion_tokens = COMPLETION_TOKENS_PER_MODULE * len(module_keys)
+            instructions = self.count_tokens(PACKED_PROMPT.format(
+                num_pairs=self.max_qna,
+                num_cards=self.flashcards_per_module,
+                modules="",
+                module_keys=", ".join(module_keys)
+            ))
+            prompt_budget = (Config.MODEL_CONTEXT_WINDOW - completion_tokens
+                             - self.count_tokens(PACKED_SYSTEM_MESSAGE) - instructions)
+            context_share = (self.max_chunk_size // 2) // len(module_keys)
+
+            sections = []
+            for module_key in module_keys:
+                section_budget = prompt_budget // len(module_keys) - self.count_tokens(
+                    PACKED_MODULE_PROMPT.format(module_key=module_key, content="", context=""))
+                if section_budget <= 0:
+                    raise ValueError(f"A pack of {len(module_keys)} modules does not fit the context window")
+                module_content = self.truncate_text(pack_data['modules'][module_key], section_budget)
+                context = self.get_cached_context(module_content, pack_data['notes'].get(module_key, ""))
+                context_budget = min(context_share, section_budget - self.count_tokens(module_content))
+                sections.append(PACKED_MODULE_PROMPT.format(
+                    module_key=module_key,
+                    content=module_content,
+                    context=self.truncate_text(context, context_budget)
+                ))
+
+            prompt = PACKED_PROMPT.format(
+                num_pairs=self.max_qna,
+                num_cards=self.flashcards_per_module,
+                modules="\n".join(sections),
+                module_keys=", ".join(module_keys)
+            )
+
+            with span("llm:packed", "llm", modules=",".join(module_keys)):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": PACKED_SYSTEM_MESSAGE},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=completion_tokens
+                )
+            record_llm_usage('packed', response.usage)
+
+            result = split_packed_response(json.loads(response.choices[0].message.content), module_keys)
+            if not result:
+                LLM_EMPTY_RESULTS.labels('packed').inc()
+            return {'type': 'packed', 'module_keys': module_keys, 'result': result}
+
+        except Exception as e:
+            LLM_ERRORS.labels('packed').inc()
+            logging.error(f"Error in process_pack: {str(e)}")
+            return {'type': 'packed', 'module_keys': module_keys, 'result': {}, 'error': str(e)}
+
+    def pack_module_limit(self, pack_token_budget: int) -> int:
+        """Most modules a packed request can hold, with completion room for each of them"""
+        fixed_tokens = (
+            self.count_tokens(PACKED_SYSTEM_MESSAGE)
+            + self.count_tokens(PACKED_PROMPT.format(
+                num_pairs=self.max_qna, num_cards=self.flashcards_per_module, modules="", module_keys=""))
+            + pack_token_budget
+            + self.max_chunk_size // 2
+        )
+        # Each module adds its section header, its key in the module list and its completion
+        per_module_tokens = (
+            self.count_tokens(PACKED_MODULE_PROMPT.format(module_key="mod00", content="", context=""))
+            + self.count_tokens("mod00, ")
+            + COMPLETION_TOKENS_PER_MODULE
+        )
+        return max_pack_modules(Config.MODEL_CONTEXT_WINDOW, fixed_tokens, per_module_tokens)
+
     def process_content_parallel(self, chunk_data: Dict) -> Dict:
         """Process content chunks in parallel"""
         try:
@@ -213,79 +350,255 @@ class ContentGenerator:
             return {
                 'type': chunk_data['type'],
                 'module_key': chunk_data['module_key'],
-                'result': [] if chunk_data['type'] == 'topics' else [{"question": "", "answer": ""}]
+                'result': self.empty_result(chunk_data['type']),
+                'error': str(e)
             }
 
-    def generate_all_content(self, syllabus_text: str, questions_texts: List[str], module_notes: Dict[str, str]) -> Dict:
+    def split_module(self, module_key: str, module_content: str, max_tokens: int) -> List[str]:
+        """
+        Split a module into chunks of whole topics when the syllabus tree has it, so
+        topics aren't cut mid-line; anything else falls back to plain token chunks.
+        """
+        module = self.syllabus_tree.get(module_key) if self.syllabus_tree else None
+        if module is None or module.content != module_content:
+            return self.chunk_content(module_content, max_tokens)
+
+        chunks, current, used = [], [], 0
+        for line in module.lines():
+            tokens = self.count_tokens(line) + 1  # plus the joining newline
+            if current and used + tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            if tokens > max_tokens:
+                chunks.extend(self.chunk_content(line, max_tokens))
+                continue
+            current.append(line)
+            used += tokens
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def module_chunks(self, module_key: str, module_content: str, mode: str) -> List[Dict]:
+        """
+        Per-chunk work items for a module that is not handled by a packed request.
+
+        When the module's topics are ranked, chunks get no topics request: "tfidf" needs
+        none, "prerank" sends one per module with just the top-ranked candidates.
+        """
+        ranked = self.topic_ranker is not None and self.topic_ranker.has(module_key)
+        chunk_items = []
+        for chunk in self.split_module(module_key, module_content, self.max_chunk_size):
+            if mode == 'combined':
+                chunk_items.append(
+                    {'chunk': chunk, 'type': 'combined', 'module_key': module_key, 'num_pairs': self.max_qna}
+                )
+            else:
+                if not ranked:
+                    chunk_items.append({'chunk': chunk, 'type': 'topics', 'module_key': module_key})
+                chunk_items.append(
+                    {'chunk': chunk, 'type': 'qa', 'module_key': module_key, 'num_pairs': self.max_qna}
+                )
+        if ranked and mode != 'combined' and Config.TOPIC_RANKING == 'prerank':
+            candidates = self.topic_ranker.top(module_key, Config.PRERANK_CANDIDATES)
+            chunk_items.append({'chunk': "\n".join(candidates), 'type': 'topics', 'module_key': module_key})
+        return chunk_items
+
+    def module_topics(self, module_key: str, generated: Set[str]) -> List[str]:
+        """A module's important topics, ranked by past questions where a ranker is in use"""
+        if self.topic_ranker is None or not self.topic_ranker.has(module_key):
+            return list(generated)[:self.max_topics]
+        if Config.TOPIC_RANKING == 'tfidf' or not generated:
+            return self.topic_ranker.top(module_key, self.max_topics)
+        return self.topic_ranker.order(module_key, generated)[:self.max_topics]
+
+    def generate_all_content(self, syllabus_text: str, questions_texts: List[str], module_notes: Dict[str, str],
+                             checkpoint_dir: Optional[str] = None, mode: Optional[str] = None,
+                             pack_token_budget: Optional[int] = None) -> Dict:
         try:
-            # Initialize vector store
-            all_texts = [syllabus_text] + questions_texts + list(module_notes.values())
-            self.vector_store.initialize(
-                texts=all_texts,
-                sources=["syllabus"] + ["questions"] * len(questions_texts) + ["notes"] * len(module_notes)
-            )
+            mode = mode or Config.GENERATION_MODE
+            if mode not in ('separate', 'combined'):
+                raise ValueError(f"Unknown generation mode: {mode}")
+            if Config.TOPIC_RANKING not in ('llm', 'tfidf', 'prerank'):
+                raise ValueError(f"Unknown topic ranking: {Config.TOPIC_RANKING}")
+            if pack_token_budget is None:
+                pack_token_budget = Config.PACK_TOKEN_BUDGET
+
+            # Resume from an earlier attempt of the same job if one was checkpointed
+            checkpoint = None
+            if checkpoint_dir:
+                inputs = GenerationCheckpoint.inputs_digest(
+                    syllabus_text, questions_texts, module_notes, mode, Config.TOPIC_RANKING, self.model
+                )
+                checkpoint = GenerationCheckpoint(checkpoint_dir, inputs)
 
-            # Extract modules
+            # Extract modules; the parsed tree is cached, so this doesn't parse twice
+            self.syllabus_tree = parse_syllabus(syllabus_text)
             modules = extract_modules(syllabus_text)
             if not modules:
                 modules = {"complete_content": syllabus_text}
 
-            # Prepare chunks for parallel processing
-            all_chunks = []
-            for module_key, module_content in modules.items():
-                chunks = self.chunk_content(module_content, self.max_chunk_size)
-                for chunk in chunks:
-                    all_chunks.extend([
-                        {'chunk': chunk, 'type': 'topics', 'module_key': module_key},
-                        {'chunk': chunk, 'type': 'qa', 'module_key': module_key, 'num_pairs': self.max_qna}
-                    ])
-
-            # Process content in parallel with improved error handling
+            # Rank syllabus topics by past questions; cheap enough to rebuild on every run
+            if Config.TOPIC_RANKING != 'llm':
+                with span("rank_topics"):
+                    questions = [q for text in questions_texts if text for q in parse_question_paper(text)]
+                    self.topic_ranker = TopicRanker(self.syllabus_tree, questions)
+
+            # Pack small modules into shared requests, larger ones are chunked as before
+            if pack_token_budget > 0:
+                packs, unpacked = pack_modules(modules, pack_token_budget, self.count_tokens,
+                                               self.pack_module_limit(pack_token_budget))
+            else:
+                packs, unpacked = [], list(modules)
+
+            all_packs = [
+                {
+                    'type': 'packed',
+                    'module_keys': pack,
+                    'modules': {k: modules[k] for k in pack},
+                    'notes': {k: module_notes.get(k, "") for k in pack}
+                }
+                for pack in packs
+            ]
             results = {}
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                future_to_chunk = {executor.submit(self.process_content_parallel, chunk): chunk 
-                                for chunk in all_chunks}
-                
-                for future in as_completed(future_to_chunk):
+            flashcards = {}
+
+            def collect(result: Dict):
+                if result['module_key'] not in results:
+                    results[result['module_key']] = {'topics': set(), 'qa': []}
+
+                if result['type'] == 'topics':
+                    results[result['module_key']]['topics'].update(result['result'])
+                elif result['type'] == 'combined':
+                    results[result['module_key']]['topics'].update(result['result']['topics'])
+                    results[result['module_key']]['qa'].extend(result['result']['qa'])
+                else:  # qa
+                    results[result['module_key']]['qa'].extend(result['result'])
+
+            def collect_pack(pack_result: Dict) -> List[str]:
+                """Record a packed result, returning the modules it failed to cover"""
+                # split_packed_response already dropped modules answered in the wrong shape
+                result = split_packed_response(pack_result['result'], pack_result['module_keys'])
+                missing = [k for k in pack_result['module_keys'] if k not in result]
+                for module_key, module_result in result.items():
+                    try:
+                        collect({'type': 'combined', 'module_key': module_key, 'result': module_result})
+                        flashcards[module_key] = self.format_flashcards(module_key, module_result['flashcards'])
+                    except Exception as e:
+                        logging.error(f"Unusable packed result for {module_key}: {str(e)}")
+                        missing.append(module_key)
+                return missing
+
+            def work_key(item: Dict) -> str:
+                if item['type'] == 'packed':
+                    return GenerationCheckpoint.pack_key(item['modules'])
+                return GenerationCheckpoint.chunk_key(item)
+
+            # Only the packs and chunks without a checkpointed result still need an LLM call
+            pending_work = []
+            for item in all_packs:
+                cached = checkpoint.get(work_key(item)) if checkpoint else None
+                if cached is None:
+                    pending_work.append(item)
+                else:
+                    unpacked.extend(collect_pack(cached))
+
+            all_chunks = []
+            for module_key in unpacked:
+                all_chunks.extend(self.module_chunks(module_key, modules[module_key], mode))
+
+            for item in all_chunks:
+                cached = checkpoint.get(work_key(item)) if checkpoint else None
+                if cached is None:
+                    pending_work.append(item)
+                else:
+                    collect(cached)
+
+            pending_modules = {}
+            for module_key in unpacked:
+                module_content = modules[module_key]
+                cached = checkpoint.get(GenerationCheckpoint.flashcard_key(module_key, module_content)) if checkpoint else None
+                if cached is not None:
+                    flashcards[module_key] = cached
+                else:
+                    pending_modules[module_key] = module_content
+
+            if checkpoint:
+                total_work = len(all_packs) + len(all_chunks)
+                logging.info(f"Resuming generation: {total_work - len(pending_work)}/{total_work} requests "
+                             f"and {len(unpacked) - len(pending_modules)}/{len(unpacked)} flashcard sets already done")
+
+            # Initialize vector store, skipped entirely when everything was checkpointed
+            if pending_work or pending_modules:
+                # Questions are indexed one by one, so retrieval returns whole questions, not page fragments
+                questions = question_lines(questions_texts)
+                all_texts = [syllabus_text] + questions + list(module_notes.values())
+                self.vector_store.initialize(
+                    texts=all_texts,
+                    sources=["syllabus"] + ["questions"] * len(questions) + ["notes"] * len(module_notes)
+                )
+
+            # Process packs and chunks in parallel on the shared LLM pool
+            llm_executor = self.resources.llm_executor
+
+            def submit(item: Dict):
+                if item['type'] == 'packed':
+                    return llm_executor.submit(in_current_context(self.process_pack), item)
+                return llm_executor.submit(in_current_context(self.process_content_parallel), item)
+
+            future_to_work = {submit(item): item for item in pending_work}
+
+            while future_to_work:
+                done, _ = wait(future_to_work, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = future_to_work.pop(future)
                     try:
                         result = future.result()
-                        if result['module_key'] not in results:
-                            results[result['module_key']] = {'topics': set(), 'qa': []}
-                        
-                        if result['type'] == 'topics':
-                            results[result['module_key']]['topics'].update(result['result'])
-                        else:  # qa
-                            results[result['module_key']]['qa'].extend(result['result'])
+                        if item['type'] == 'packed':
+                            missing = collect_pack(result)
+                            # Modules the packed request did not cover fall back to the regular path
+                            for module_key in missing:
+                                logging.warning(f"Packed request did not cover {module_key}, retrying it on its own")
+                                pending_modules[module_key] = modules[module_key]
+                                for chunk_item in self.module_chunks(module_key, modules[module_key], mode):
+                                    future_to_work[submit(chunk_item)] = chunk_item
+                        else:
+                            collect(result)
+                        if checkpoint and not result.get('error'):
+                            checkpoint.save(work_key(item), result)
                     except Exception as e:
                         print(f"Error processing future: {str(e)}")
 
             # Generate module-specific flashcards in parallel
-            flashcards = {}
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                future_to_module = {
-                    executor.submit(
-                        self.generate_module_flashcards,
-                        module_key,
-                        module_content,
-                        module_notes.get(module_key, ""),  # Pass empty string if no notes found
-                        results[module_key]['qa'] if module_key in results else None
-                    ): module_key
-                    for module_key, module_content in modules.items()
-                }
-                
-                for future in as_completed(future_to_module):
-                    module_key = future_to_module[future]
-                    try:
-                        flashcards[module_key] = future.result()
-                    except Exception as e:
-                        print(f"Error generating flashcards for module {module_key}: {str(e)}")
-                        flashcards[module_key] = []
+            flashcard_executor = self.resources.flashcard_executor
+            future_to_module = {
+                flashcard_executor.submit(
+                    in_current_context(self.generate_module_flashcards),
+                    module_key,
+                    module_content,
+                    module_notes.get(module_key, ""),  # Pass empty string if no notes found
+                    results[module_key]['qa'] if module_key in results else None
+                ): module_key
+                for module_key, module_content in pending_modules.items()
+            }
+            
+            for future in as_completed(future_to_module):
+                module_key = future_to_module[future]
+                try:
+                    flashcards[module_key] = future.result()
+                    if checkpoint and flashcards[module_key]:
+                        checkpoint.save(
+                            GenerationCheckpoint.flashcard_key(module_key, pending_modules[module_key]),
+                            flashcards[module_key]
+                        )
+                except Exception as e:
+                    print(f"Error generating flashcards for module {module_key}: {str(e)}")
+                    flashcards[module_key] = []
 
             # Format final results
             return {
-                "important_topics": {k: list(v['topics'])[:self.max_topics] for k, v in results.items()},
+                "important_topics": {k: self.module_topics(k, v['topics']) for k, v in results.items()},
                 "important_qna": {k: v['qa'][:self.max_qna] for k, v in results.items()},
                 "flashcards":flashcards}
         except Exception as e:
             logging.error(f"Error in generate_all_content: {str(e)}")
-            raise
\ No newline at end of file
+            raise
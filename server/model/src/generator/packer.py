@@ -0,0 +1,78 @@
+# packer.py
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Completion tokens reserved per module of a packed request, for its topics, QA pairs and flashcards
+COMPLETION_TOKENS_PER_MODULE = 700
+
+
+def max_pack_modules(context_window: int, fixed_tokens: int, per_module_tokens: int) -> int:
+    """How many modules one packed request can hold within the model's context window.
+
+    fixed_tokens covers what a pack needs whatever its size (instructions, the packed
+    content and its context); per_module_tokens what each module adds on top,
+    including its share of the completion.
+    """
+    return max((context_window - fixed_tokens) // per_module_tokens, 0)
+
+
+def pack_modules(modules: Dict[str, str], token_budget: int, count_tokens: Callable[[str], int],
+                 max_modules: Optional[int] = None) -> Tuple[List[List[str]], List[str]]:
+    """Group small modules into packs whose combined content fits in token_budget.
+
+    Modules are packed greedily in syllabus order so neighbouring modules share a
+    request, at most max_modules to a pack. Returns the packs as lists of module keys,
+    plus the keys of modules that are too large to pack and must go through the
+    per-chunk path (all of them when not even one module fits a pack).
+    """
+    if max_modules is not None and max_modules < 1:
+        return [], list(modules)
+
+    packs = []
+    oversized = []
+    current, current_tokens = [], 0
+
+    for module_key, module_content in modules.items():
+        tokens = count_tokens(module_content)
+        if tokens > token_budget:
+            oversized.append(module_key)
+            continue
+        full = max_modules is not None and len(current) >= max_modules
+        if current and (full or current_tokens + tokens > token_budget):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(module_key)
+        current_tokens += tokens
+
+    if current:
+        packs.append(current)
+
+    return packs, oversized
+
+
+def split_packed_response(response: Dict, module_keys: List[str]) -> Dict[str, Dict]:
+    """Split a packed response back per module_key.
+
+    Topics are kept only if they are strings, QA pairs and flashcards only if they are
+    objects with a question and an answer. Modules the model left out or answered in the
+    wrong shape are omitted, so the caller can retry them on the regular path.
+    """
+    split = {}
+    if not isinstance(response, dict):
+        return split
+    for module_key in module_keys:
+        entry = response.get(module_key)
+        if not isinstance(entry, dict):
+            continue
+        fields = {name: entry.get(name, []) for name in ('topics', 'qa', 'flashcards')}
+        if not all(isinstance(value, list) for value in fields.values()):
+            continue
+        split[module_key] = {
+            'topics': [topic for topic in fields['topics'] if isinstance(topic, str)],
+            'qa': [pair for pair in fields['qa'] if _is_pair(pair)],
+            'flashcards': [card for card in fields['flashcards'] if _is_pair(card)]
+        }
+    return split
+
+
+def _is_pair(item) -> bool:
+    return isinstance(item, dict) and "question" in item and "answer" in item
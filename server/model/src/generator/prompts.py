@@ -24,6 +24,43 @@ Additional Context:
 Return as a JSON array of {num_pairs} objects with 'question' and 'answer' keys.
 """
 
+COMBINED_PROMPT = """
+Based on this content and additional context, do two things for {module_key}:
+1. Identify the most important topics. List only the topic names, no descriptions. Be specific and concise.
+2. Create {num_pairs} important question-answer pairs. Questions should be specific and answers should be concise but complete.
+
+Content:
+{content}
+
+Additional Context:
+{context}
+
+Return only a JSON object in this exact format:
+{{"topics": ["topic name", ...], "qa": [{{"question": "question text", "answer": "answer text"}}, ...]}}
+"""
+
+PACKED_MODULE_PROMPT = """
+=== {module_key} ===
+Content:
+{content}
+
+Additional Context:
+{context}
+"""
+
+PACKED_PROMPT = """
+Below are several syllabus modules. For each module, do three things:
+1. Identify the most important topics. List only the topic names, no descriptions. Be specific and concise.
+2. Create {num_pairs} important question-answer pairs. Questions should be specific and answers should be concise but complete.
+3. Create exactly {num_cards} flashcard pairs. Each flashcard should test a different concept, focusing on key terminology, definitions, and core concepts.
+
+{modules}
+
+Return only a JSON object keyed by module name, covering every one of these modules: {module_keys}
+Use this exact format:
+{{"<module name>": {{"topics": ["topic name", ...], "qa": [{{"question": "question text", "answer": "answer text"}}, ...], "flashcards": [{{"question": "question text", "answer": "answer text"}}, ...]}}, ...}}
+"""
+
 FLASHCARD_PROMPT = """
 Create {num_cards} flashcard-style question-answer pairs from these notes and context.
 Focus on key concepts and definitions. Keep both questions and answers concise.
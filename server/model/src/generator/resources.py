@@ -0,0 +1,85 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import tiktoken
+from openai import OpenAI
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from model.src.config import Config
+from model.src.rag.embeddings import get_embeddings
+from model.src.utils.scheduling import FairScheduler
+
+
+class TokenCountCache:
+    """Thread-safe, size-bounded LRU of text -> token count shared by all jobs"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[int]:
+        with self._lock:
+            count = self._entries.get(text)
+            if count is not None:
+                self._entries.move_to_end(text)
+            return count
+
+    def put(self, text: str, count: int):
+        with self._lock:
+            self._entries[text] = count
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class GeneratorResources:
+    """
+    Long-lived objects every ContentGenerator can share: the OpenAI client (and its
+    connection pool, also used for embeddings), the tokenizer, the text splitter,
+    the token-count cache and the fair-share worker pools LLM calls run on.
+
+    Anything tied to one job's documents, like the vector store, stays on the generator.
+    """
+
+    def __init__(self):
+        self.client = OpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL)
+        self.embeddings = get_embeddings(client=self.client)
+        self.encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=Config.CHUNK_SIZE,
+            chunk_overlap=Config.CHUNK_OVERLAP
+        )
+        self.token_counts = TokenCountCache(Config.TOKEN_COUNT_CACHE_SIZE)
+        # Bounded across all jobs, so concurrent uploads can't open unbounded connections,
+        # and shared between users fairly rather than in submission order
+        self.llm_executor = FairScheduler(Config.LLM_WORKERS, "llm")
+        self.flashcard_executor = FairScheduler(Config.FLASHCARD_WORKERS, "flashcards")
+
+    def close(self):
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
+        self.flashcard_executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+
+
+_resources: Optional[GeneratorResources] = None
+_resources_lock = threading.Lock()
+
+
+def get_resources() -> GeneratorResources:
+    """The process-wide GeneratorResources, created on first use"""
+    global _resources
+    if _resources is None:
+        with _resources_lock:
+            if _resources is None:
+                _resources = GeneratorResources()
+                logging.info("Generator resources initialized")
+    return _resources
@@ -1,8 +1,10 @@
 from langchain_openai import OpenAIEmbeddings
 from model.src.config import Config
 
-def get_embeddings():
-    """Initialize OpenAI embeddings"""
+def get_embeddings(client=None):
+    """Initialize OpenAI embeddings, reusing `client`'s connection pool when one is given"""
     return OpenAIEmbeddings(
-        openai_api_key=Config.OPENAI_API_KEY
+        openai_api_key=Config.OPENAI_API_KEY,
+        openai_api_base=Config.OPENAI_BASE_URL,
+        client=client.embeddings if client else None
     )
\ No newline at end of file
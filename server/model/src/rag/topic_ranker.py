@@ -0,0 +1,144 @@
+from typing import Dict, Iterable, List, Sequence
+import re
+import numpy as np
+from model.src.utils.question_paper import Question, PART_A_MARKS
+from model.src.utils.syllabus import Module, SyllabusTree
+
+TOKEN = re.compile(r"[a-z0-9]+")
+# Function words, and the instruction words every question uses whatever its topic
+STOP_WORDS = frozenset("""
+a an the and or of in on to for with by from as at is are be was were it its this that these those
+any all each their into than then can does do how what which why when where who whom
+explain define describe discuss list write draw give state illustrate mention briefly outline
+differentiate distinguish compare between different various use using used example examples
+neat diagram figure help following given find calculate short note notes detail details
+""".split())
+# Topic lines are split into phrases at these separators
+PHRASE_SPLIT = re.compile(r"[,;:]|\.\s|\s[-–—]\s")
+# Teaching-plan annotations such as "(Lecture 2)" or "(2 hours)"
+ANNOTATION = re.compile(r"\s*\((?:lecture|\d+\s*hours?)[^)]*\)?", re.IGNORECASE)
+ENUMERATION = re.compile(r"^\(?(?:\d{1,2}(?:\.\d{1,2})?|[ivx]{1,4}|[a-e])\)?[.)]?\s+", re.IGNORECASE)
+# A past question from another module still counts towards a topic, at this weight
+OTHER_MODULE_WEIGHT = 0.2
+
+
+def _stem(word: str) -> str:
+    """Fold plurals, so "page faults" and "page fault" share terms"""
+    if word.endswith("sses"):
+        return word[:-2]
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and len(word) > 3 and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def _terms(text: str) -> List[str]:
+    """Stemmed unigrams and bigrams of text, without stop words"""
+    words = [_stem(word) for word in TOKEN.findall(text.lower()) if word not in STOP_WORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def _phrases(module: Module) -> List[str]:
+    """Candidate topics of a module: its topic lines split into phrases, in syllabus order"""
+    phrases, seen = [], set()
+    for topic in module.topics:
+        for phrase in PHRASE_SPLIT.split(ANNOTATION.sub("", topic.text)):
+            phrase = ENUMERATION.sub("", " ".join(phrase.split())).strip(" .()")
+            if sum(c.isalpha() for c in phrase) >= 3 and phrase.lower() not in seen:
+                seen.add(phrase.lower())
+                phrases.append(phrase)
+    return phrases
+
+
+class TopicRanker:
+    """
+    Ranks syllabus topics by how often past questions ask about them, without LLM calls.
+
+    Candidate topics (phrases of the syllabus topic lines) and past questions become
+    TF-IDF vectors over a shared vocabulary. A topic's score is the sum of its cosine
+    similarity to every question, weighted by the question's marks and down-weighted for
+    questions tagged with another module. Ties keep syllabus order, so the ranking is
+    deterministic, and without past questions it is plain syllabus order.
+    """
+
+    def __init__(self, tree: SyllabusTree, questions: Sequence[Question]):
+        self._candidates: Dict[str, List[str]] = {}
+        self._module_numbers: Dict[str, int] = {}
+        for module in tree.modules:
+            phrases = _phrases(module)
+            if phrases:
+                self._candidates[module.key] = phrases
+                self._module_numbers[module.key] = module.number
+
+        candidate_terms = [_terms(phrase) for phrases in self._candidates.values() for phrase in phrases]
+        question_terms = [_terms(question.text) for question in questions]
+        self._vocabulary: Dict[str, int] = {}
+        for terms in candidate_terms + question_terms:
+            for term in terms:
+                self._vocabulary.setdefault(term, len(self._vocabulary))
+
+        # Smoothed IDF over topics and questions together
+        counts = self._counts(candidate_terms + question_terms)
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self._idf = np.log((1 + len(counts)) / (1 + document_frequency)) + 1
+
+        self._questions = self._weigh(counts[len(candidate_terms):])
+        self._question_weights = np.array(
+            [(question.marks or PART_A_MARKS) / PART_A_MARKS for question in questions], dtype=np.float32
+        )
+        self._question_modules = np.array([question.module or 0 for question in questions], dtype=np.int32)
+
+        # Score every candidate of every module in one pass
+        candidates = self._weigh(counts[:len(candidate_terms)])
+        modules = np.array(
+            [self._module_numbers[key] for key, phrases in self._candidates.items() for _ in phrases], dtype=np.int32
+        )
+        scores = self._score(candidates, modules)
+        self._scores: Dict[str, np.ndarray] = {}
+        offset = 0
+        for key, phrases in self._candidates.items():
+            self._scores[key] = scores[offset:offset + len(phrases)]
+            offset += len(phrases)
+
+    def _counts(self, documents: List[List[str]]) -> np.ndarray:
+        """Term counts, one row per document, for the terms in the vocabulary"""
+        width = len(self._vocabulary)
+        columns = [[self._vocabulary[term] for term in terms if term in self._vocabulary] for terms in documents]
+        rows = np.repeat(np.arange(len(columns)), [len(c) for c in columns])
+        flat = np.fromiter((column for c in columns for column in c), dtype=np.int64, count=len(rows))
+        counts = np.bincount(rows * width + flat, minlength=len(columns) * width)
+        return counts.reshape(len(columns), width).astype(np.float32)
+
+    def _weigh(self, counts: np.ndarray) -> np.ndarray:
+        """Sublinear TF-IDF rows, L2-normalised so dot products are cosine similarities"""
+        weights = np.zeros_like(counts)
+        present = counts > 0
+        weights[present] = 1 + np.log(counts[present])
+        weights *= self._idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        return weights / np.maximum(norms, 1e-12)
+
+    def _score(self, vectors: np.ndarray, modules: np.ndarray) -> np.ndarray:
+        if not len(self._question_weights):
+            return np.zeros(len(vectors), dtype=np.float32)
+        similarity = vectors @ self._questions.T
+        same_module = (modules[:, None] == self._question_modules[None, :]) | (self._question_modules[None, :] == 0)
+        return (similarity * np.where(same_module, 1.0, OTHER_MODULE_WEIGHT)) @ self._question_weights
+
+    def has(self, module_key: str) -> bool:
+        return module_key in self._candidates
+
+    def top(self, module_key: str, count: int) -> List[str]:
+        """The module's count highest-scoring syllabus topics"""
+        order = np.argsort(-self._scores[module_key], kind="stable")[:count]
+        return [self._candidates[module_key][i] for i in order]
+
+    def order(self, module_key: str, topics: Iterable[str]) -> List[str]:
+        """Order other topic names, e.g. LLM-generated ones, by the same score; ties by name"""
+        topics = sorted(topics)
+        if not topics:
+            return []
+        modules = np.full(len(topics), self._module_numbers.get(module_key, 0), dtype=np.int32)
+        scores = self._score(self._weigh(self._counts([_terms(topic) for topic in topics])), modules)
+        return [topics[i] for i in np.argsort(-scores, kind="stable")]
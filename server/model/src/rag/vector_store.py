@@ -1,13 +1,17 @@
 from typing import List, Dict
 import faiss
+import tiktoken
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from .embeddings import get_embeddings
 from model.src.config import Config
+from model.src.utils.metrics import record_embedding_tokens
+from model.src.utils.tracing import span
 class VectorStore:
-    def __init__(self):
-        self.embeddings = get_embeddings()
-        self.text_splitter = RecursiveCharacterTextSplitter(
+    def __init__(self, embeddings=None, text_splitter=None):
+        # Both are stateless and can be shared; the index built in initialize() is not
+        self.embeddings = embeddings or get_embeddings()
+        self.text_splitter = text_splitter or RecursiveCharacterTextSplitter(
             chunk_size=Config.CHUNK_SIZE,
             chunk_overlap=Config.CHUNK_OVERLAP
         )
@@ -18,19 +22,24 @@ class VectorStore:
         all_chunks = []
         all_metadatas = []
         
-        for text, source in zip(texts, sources):
-            if text:  # Only process non-empty texts
-                chunks = self.text_splitter.split_text(text)
-                metadatas = [{"source": source} for _ in chunks]
-                all_chunks.extend(chunks)
-                all_metadatas.extend(metadatas)
+        with span("split"):
+            for text, source in zip(texts, sources):
+                if text:  # Only process non-empty texts
+                    chunks = self.text_splitter.split_text(text)
+                    metadatas = [{"source": source} for _ in chunks]
+                    all_chunks.extend(chunks)
+                    all_metadatas.extend(metadatas)
         
         if all_chunks:
-            self.vectorstore = FAISS.from_texts(
-                all_chunks,
-                self.embeddings,
-                metadatas=all_metadatas
-            )
+            # Embedding responses don't surface usage, so count what we send
+            encoding = tiktoken.get_encoding("cl100k_base")
+            record_embedding_tokens(sum(len(tokens) for tokens in encoding.encode_batch(all_chunks)))
+            with span("embed", chunks=len(all_chunks)):
+                self.vectorstore = FAISS.from_texts(
+                    all_chunks,
+                    self.embeddings,
+                    metadatas=all_metadatas
+                )
 
     def get_relevant_context(self, query: str, k: int = 3) -> str:
         """Retrieve relevant context"""
@@ -0,0 +1,42 @@
+from prometheus_client import Counter, Histogram
+
+# LLM telemetry shared by the generator and the vector store. Task is one of
+# topics, qa, combined, packed, flashcards or embeddings.
+LLM_TOKENS = Counter(
+    "studygpt_llm_tokens_total",
+    "OpenAI tokens used, by task type and token kind",
+    ["task", "kind"]
+)
+LLM_REQUESTS = Counter(
+    "studygpt_llm_requests_total",
+    "OpenAI requests issued, by task type",
+    ["task"]
+)
+LLM_ERRORS = Counter(
+    "studygpt_llm_errors_total",
+    "OpenAI requests that failed or returned unparseable content, by task type",
+    ["task"]
+)
+LLM_EMPTY_RESULTS = Counter(
+    "studygpt_llm_empty_results_total",
+    "OpenAI requests that succeeded but produced no usable items, by task type",
+    ["task"]
+)
+SCHEDULER_QUEUE_WAIT = Histogram(
+    "studygpt_scheduler_queue_wait_seconds",
+    "Time generation and extraction work waited for a worker, by pool and priority class",
+    ["pool", "priority"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+def record_llm_usage(task: str, usage) -> None:
+    """Record the token usage reported on a chat completion response"""
+    LLM_REQUESTS.labels(task).inc()
+    if usage is None:
+        return
+    LLM_TOKENS.labels(task, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(task, "completion").inc(usage.completion_tokens or 0)
+
+def record_embedding_tokens(tokens: int) -> None:
+    LLM_REQUESTS.labels("embeddings").inc()
+    LLM_TOKENS.labels("embeddings", "prompt").inc(tokens)
@@ -0,0 +1,280 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import re
+from model.src.utils.syllabus import REPEATED_LINE, module_number
+
+# KTU 2019-scheme papers: Part A has ten 3-mark questions, Part B ten 14-mark questions
+# numbered on from 11; both have two questions per module, in module order
+PART_A_QUESTIONS = 10
+PART_A_MARKS = 3
+PART_B_MARKS = 14
+QUESTIONS_PER_MODULE = 2
+# A question number may skip this many numbers when OCR lost the ones in between
+MAX_NUMBER_SKIP = 2
+# Per-subject question index, stored next to the subject's other job files
+INDEX_FILENAME = "questions.json"
+INDEX_VERSION = 1
+
+# "PART A", "PART  B", and OCR slips such as "*ARTB"
+PART = re.compile(r"^\W*[p*]?\s*a\s*r\s*t\s*[-–:]?\s*([ab])\W*$", re.IGNORECASE)
+# "Module -1", "Module I", "MODULE 2", and OCR slips such as "Mo@le -1"
+MODULE_HEADING = re.compile(r"^\W*mo\S{0,5}\s*[-–:]?\s*(\d{1,2}|[ivx]{1,4})\W*$", re.IGNORECASE)
+# A question number, where OCR turns 1 into l or I and may split 11 into "I I", then
+# optionally a sub-part label and the question text
+QUESTION = re.compile(r"^([lI1] [lI0-9]|[0-9lI]{1,2})(?:\s+[\"',.]*\s*(?:\(?([a-e])\)\s*)?(.*))?$")
+# A sub-part such as "a) ..." or "(b) ..."
+SUB_PART = re.compile(r"^[\"',.]?\s*\(?([a-e])\)\s*(.*)$")
+# Marks at the end of a line: "(7)", or a number set apart by a column gap or after the question's "?"
+TRAILING_MARKS = re.compile(r"(?:\s*\((\d{1,2})\)|(?:\s{2,}|(?<=[?.])\s+)(\d{1,2}))\s*$")
+LONE_MARKS = re.compile(r"^\(?(\d{1,2})\)?$")
+# How questions usually open; used where the question numbers were lost
+OPENER = re.compile(
+    r"^(?:what|which|why|how|when|define|explain|describe|discuss|list|differentiate|distinguish|compare"
+    r"|write|draw|give|state|illustrate|mention|briefly|consider|find|calculate|show|prove|construct)\b",
+    re.IGNORECASE
+)
+NOISE = re.compile(
+    r"^(?:page\s*\S+\s*of\s*\S+|pages\s*:.*|reg\.?\s*no.*|name\s*:.*|marks|or\W*|\*+|\W*answer\b.*"
+    r"|duration\s*:.*|max\.?\s*marks.*|course\s*(?:code|name)\s*:.*)$",
+    re.IGNORECASE
+)
+# Paper codes printed on every page, such as "02000CST204052104"
+PAPER_CODE = re.compile(r"^(?=(?:\S*\d){6})\S{12,}$")
+
+_OCR_DIGITS = str.maketrans("lI", "11", " ")
+
+
+class Question(NamedTuple):
+    """One question, or one sub-part of a question, of a question paper"""
+    source: str
+    part: str
+    number: int
+    sub: Optional[str]
+    module: Optional[int]
+    marks: Optional[int]
+    text: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.number}{f'({self.sub})' if self.sub else ''}"
+
+    def line(self) -> str:
+        """The question as a single line, tagged with its module and marks"""
+        tags = [f"module {self.module}" if self.module else "", f"{self.marks} marks" if self.marks else ""]
+        tags = ", ".join(tag for tag in tags if tag)
+        return f"Q{self.label}{f' [{tags}]' if tags else ''}: {self.text}"
+
+
+class _Unit:
+    """A question or sub-part while its lines are being collected"""
+
+    def __init__(self, part: str, number: int, sub: Optional[str], heading: Optional[int]):
+        self.part = part
+        self.number = number
+        self.sub = sub
+        self.heading = heading
+        self.marks: Optional[int] = None
+        self.lines: List[str] = []
+
+    def add(self, line: str):
+        marks = TRAILING_MARKS.search(line)
+        if marks:
+            if self.marks is None:
+                self.marks = int(marks.group(1) or marks.group(2))
+            line = line[:marks.start()]
+        if line.strip():
+            self.lines.append(line)
+
+    @property
+    def text(self) -> str:
+        return " ".join(" ".join(self.lines).split())
+
+
+def _question_number(token: str) -> Optional[int]:
+    digits = token.translate(_OCR_DIGITS)
+    return int(digits) if digits.isdigit() else None
+
+
+def _debris(line: str) -> bool:
+    """OCR leftovers such as stray letters and column fragments"""
+    return len(re.sub(r"\W", "", line)) < 3
+
+
+def _next_sub(sub: Optional[str]) -> str:
+    return "a" if sub is None else chr(ord(sub) + 1)
+
+
+def _starts_question(lines: Sequence[str], index: int) -> bool:
+    """Whether a bare number line introduces a question rather than giving marks"""
+    following = lines[index + 1] if index + 1 < len(lines) else ""
+    return bool(SUB_PART.match(following)) or (following[:1].isupper() and not _debris(following))
+
+
+def _parse_numbered(lines: Sequence[str], part: Optional[str], first: int) -> List[_Unit]:
+    """Questions introduced by their numbers, with sub-parts labelled a), b), ..."""
+    units: List[_Unit] = []
+    expected = first
+    heading = None
+    for index, line in enumerate(lines):
+        module = MODULE_HEADING.match(line)
+        if module:
+            heading = module_number(module.group(1))
+            continue
+        start = QUESTION.match(line)
+        number = _question_number(start.group(1)) if start else None
+        if number is not None and expected <= number <= expected + MAX_NUMBER_SKIP and (
+                start.group(3) or start.group(2) or _starts_question(lines, index)):
+            unit_part = part or ("A" if number <= PART_A_QUESTIONS else "B")
+            units.append(_Unit(unit_part, number, start.group(2), heading))
+            units[-1].add(start.group(3) or "")
+            expected = number + 1
+            continue
+        if not units:
+            continue
+        lone = LONE_MARKS.match(line)
+        if lone:
+            # A run of bare numbers is a table, not marks; "(5)" is always marks
+            in_run = not line.startswith("(") and any(
+                0 <= i < len(lines) and lines[i].isdigit() for i in (index - 1, index + 1))
+            if units[-1].marks is None and not in_run and 0 < int(lone.group(1)) <= PART_B_MARKS:
+                units[-1].marks = int(lone.group(1))
+            continue
+        sub = SUB_PART.match(line)
+        if sub and sub.group(1) == _next_sub(units[-1].sub):
+            current = units[-1]
+            if current.sub is None and current.lines:
+                # Text before "a)" was the question's common stem; keep it on its first sub-part
+                current.sub = sub.group(1)
+                current.add(sub.group(2))
+            else:
+                units.append(_Unit(current.part, current.number, sub.group(1), heading))
+                units[-1].add(sub.group(2))
+            continue
+        if not _debris(line):
+            units[-1].add(line)
+    return units
+
+
+def _parse_unnumbered(lines: Sequence[str], part: str) -> List[_Unit]:
+    """
+    Questions whose numbers were extracted as a separate column: a new question starts
+    after a line ending in "?" or ".", unless the line is an enumeration such as "(ii)",
+    or on any line that opens like a question.
+    """
+    units: List[_Unit] = []
+    for line in lines:
+        if LONE_MARKS.match(line) or _debris(line) or MODULE_HEADING.match(line):
+            continue
+        numbered = QUESTION.match(line)
+        if numbered and numbered.group(3):
+            line = numbered.group(3)
+        ended = not units or units[-1].text.endswith(("?", "."))
+        if (ended and not line.startswith("(")) or OPENER.match(line):
+            units.append(_Unit(part, len(units) + 1, None, None))
+        units[-1].add(line)
+    return units
+
+
+def _module_of(unit: _Unit) -> Optional[int]:
+    """Module by KTU numbering, falling back to the nearest module heading"""
+    if unit.part == "A" and 1 <= unit.number <= PART_A_QUESTIONS:
+        return (unit.number - 1) // QUESTIONS_PER_MODULE + 1
+    first_b = PART_A_QUESTIONS + 1
+    if unit.part == "B" and first_b <= unit.number < first_b + PART_A_QUESTIONS:
+        return (unit.number - first_b) // QUESTIONS_PER_MODULE + 1
+    return unit.heading
+
+
+def _fill_marks(units: List[_Unit]):
+    """Part A questions carry fixed marks; a Part B sub-part without marks takes what's left"""
+    by_number: Dict[Tuple[str, int], List[_Unit]] = {}
+    for unit in units:
+        if unit.part == "A":
+            unit.marks = PART_A_MARKS
+        else:
+            by_number.setdefault((unit.part, unit.number), []).append(unit)
+    for parts in by_number.values():
+        missing = [unit for unit in parts if unit.marks is None]
+        remaining = PART_B_MARKS - sum(unit.marks for unit in parts if unit.marks is not None)
+        if len(missing) == 1 and remaining > 0:
+            missing[0].marks = remaining
+
+
+@lru_cache(maxsize=64)
+def parse_question_paper(text: str, source: str = "") -> Tuple[Question, ...]:
+    """
+    Split the text of a KTU question paper into its questions and sub-parts.
+
+    Page headers, paper codes and OCR debris are dropped. Each question is tagged with
+    its part, its module (from KTU's fixed numbering, or the nearest "Module" heading for
+    papers that don't follow it) and its marks, where the paper states them. The result
+    is cached and shared, so it is immutable.
+    """
+    stripped = [line.strip() for line in text.splitlines()]
+    counts = Counter(stripped)
+    repeated = {line for line, count in counts.items()
+                if count >= REPEATED_LINE and not _debris(line) and not LONE_MARKS.match(line)}
+    lines = [
+        line for line in stripped
+        if line and line not in repeated and not NOISE.match(line) and not PAPER_CODE.match(line)
+    ]
+
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in lines:
+        part = PART.match(line)
+        if part:
+            current = part.group(1).upper()
+            sections.setdefault(current, [])
+        elif current:
+            sections[current].append(line)
+
+    if not sections:
+        units = _parse_numbered(lines, None, 1)
+    else:
+        units = _parse_numbered(sections.get("A", []), "A", 1)
+        # Numbers printed as a column come out as a run of empty questions
+        if sum(1 for unit in units if unit.text) < max(2, len(units) // 2):
+            units = _parse_unnumbered(sections.get("A", []), "A")
+        first_b = max([PART_A_QUESTIONS] + [unit.number for unit in units]) + 1
+        units += _parse_numbered(sections.get("B", []), "B", first_b)
+
+    units = [unit for unit in units if unit.text]
+    _fill_marks(units)
+    return tuple(
+        Question(source, unit.part, unit.number, unit.sub, _module_of(unit), unit.marks, unit.text)
+        for unit in units
+    )
+
+
+def question_lines(texts: Sequence[str]) -> List[str]:
+    """One line per question of each paper; a paper that doesn't parse is kept whole"""
+    lines = []
+    for text in texts:
+        questions = parse_question_paper(text) if text else ()
+        if questions:
+            lines.extend(question.line() for question in questions)
+        elif text:
+            lines.append(text)
+    return lines
+
+
+def build_question_index(papers: Sequence[Tuple[str, str]]) -> Dict[str, Any]:
+    """
+    The per-subject question index: every question of every (source, text) paper, plus
+    per-paper and per-module counts.
+    """
+    questions: List[Question] = []
+    counts = []
+    for source, text in papers:
+        parsed = parse_question_paper(text, source) if text else ()
+        questions.extend(parsed)
+        counts.append({"source": source, "questions": len(parsed)})
+    modules = Counter(f"mod{question.module}" for question in questions if question.module)
+    return {
+        "version": INDEX_VERSION,
+        "papers": counts,
+        "modules": dict(sorted(modules.items())),
+        "questions": [question._asdict() for question in questions],
+    }
@@ -0,0 +1,198 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, NamedTuple, Optional, Tuple
+import logging
+import threading
+import time
+
+from model.src.config import Config, check_scheduler_weights
+from model.src.utils.metrics import SCHEDULER_QUEUE_WAIT
+
+
+class JobFlow(NamedTuple):
+    """Who a piece of scheduled work belongs to"""
+    user_id: str
+    job_id: str
+    priority: str = "standard"
+
+
+_current_flow: ContextVar[Optional[JobFlow]] = ContextVar("studygpt_job_flow", default=None)
+_ANONYMOUS = JobFlow("anonymous", "anonymous")
+
+
+def start_job(user_id: str, job_id: str, priority: str = "standard") -> JobFlow:
+    """Attribute work submitted from the current context (and its copies) to this job"""
+    if priority not in Config.SCHEDULER_WEIGHTS:
+        raise ValueError(f"Unknown priority class: {priority}")
+    flow = JobFlow(user_id, job_id, priority)
+    _current_flow.set(flow)
+    return flow
+
+
+def current_job() -> Optional[JobFlow]:
+    return _current_flow.get()
+
+
+def classify_job(file_count: int) -> str:
+    """Priority class for an upload job of this many files"""
+    if file_count <= Config.SMALL_JOB_MAX_FILES:
+        return "interactive"
+    if file_count >= Config.BULK_JOB_MIN_FILES:
+        return "bulk"
+    return "standard"
+
+
+class _Task(NamedTuple):
+    future: Future
+    func: Callable
+    args: tuple
+    kwargs: dict
+    cost: float
+    queued: float
+
+
+class _Flow:
+    """One user's queued work in one priority class, with a FIFO per job served round-robin"""
+
+    def __init__(self, quantum: float):
+        self.quantum = quantum
+        self.deficit = 0.0
+        self.in_turn = False
+        self.jobs: "OrderedDict[str, Deque[_Task]]" = OrderedDict()
+
+    def push(self, job_id: str, task: _Task):
+        self.jobs.setdefault(job_id, deque()).append(task)
+
+    def head(self) -> _Task:
+        return next(iter(self.jobs.values()))[0]
+
+    def pop(self) -> _Task:
+        job_id, tasks = next(iter(self.jobs.items()))
+        task = tasks.popleft()
+        if tasks:
+            self.jobs.move_to_end(job_id)
+        else:
+            del self.jobs[job_id]
+        return task
+
+
+class FairScheduler:
+    """
+    A thread pool that shares its workers fairly between users instead of first come, first served.
+
+    Queued work is grouped into flows by (priority class, user) and flows are served by
+    deficit round-robin: each turn a flow earns its class weight in credit and runs tasks
+    while it has credit for them. A user with 3 files therefore gets the same share of
+    workers as one with 20, and within a user their jobs take turns. Work is attributed
+    to the JobFlow set with start_job(); anything else shares one anonymous flow.
+
+    Supports the parts of the Executor interface the generator uses: submit and shutdown.
+    """
+
+    def __init__(self, max_workers: int, name: str, weights: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.weights = check_scheduler_weights(weights or Config.SCHEDULER_WEIGHTS)
+        self._flows: Dict[Tuple[str, str], _Flow] = {}
+        self._active: Deque[Tuple[str, str]] = deque()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{index}", daemon=True)
+            for index in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        return self.submit_costed(1.0, func, *args, **kwargs)
+
+    def submit_costed(self, cost: float, func: Callable, *args, **kwargs) -> Future:
+        """Queue func for the current job; cost is its size relative to a typical task"""
+        flow_id = current_job() or _ANONYMOUS
+        future = Future()
+        task = _Task(future, func, args, kwargs, cost, time.perf_counter())
+        key = (flow_id.priority, flow_id.user_id)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError(f"{self.name} scheduler has been shut down")
+            flow = self._flows.get(key)
+            if flow is None:
+                flow = self._flows[key] = _Flow(self.weights[flow_id.priority])
+                self._active.append(key)
+            flow.push(flow_id.job_id, task)
+            self._condition.notify()
+        return future
+
+    def _next_task(self) -> Tuple[Tuple[str, str], _Task]:
+        """Deficit round-robin over the active flows; called with the lock held and work queued"""
+        while True:
+            key = self._active[0]
+            flow = self._flows[key]
+            if not flow.in_turn:
+                flow.deficit += flow.quantum
+                flow.in_turn = True
+            if flow.deficit >= flow.head().cost:
+                task = flow.pop()
+                flow.deficit -= task.cost
+                if not flow.jobs:
+                    # An idle flow doesn't bank credit
+                    del self._flows[key]
+                    self._active.popleft()
+                return key, task
+            flow.in_turn = False
+            self._active.rotate(-1)
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._active and not self._shutdown:
+                    self._condition.wait()
+                if not self._active:
+                    return
+                (priority, _), task = self._next_task()
+            if not task.future.set_running_or_notify_cancel():
+                continue
+            SCHEDULER_QUEUE_WAIT.labels(self.name, priority).observe(time.perf_counter() - task.queued)
+            try:
+                result = task.func(*task.args, **task.kwargs)
+            except BaseException as e:
+                task.future.set_exception(e)
+            else:
+                task.future.set_result(result)
+
+    def queued(self) -> Dict[str, int]:
+        """Queued task count per user, for status and debugging"""
+        with self._condition:
+            counts: Dict[str, int] = {}
+            for (_, user_id), flow in self._flows.items():
+                counts[user_id] = counts.get(user_id, 0) + sum(len(tasks) for tasks in flow.jobs.values())
+            return counts
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        with self._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for flow in self._flows.values():
+                    for tasks in flow.jobs.values():
+                        for task in tasks:
+                            task.future.cancel()
+                self._flows.clear()
+                self._active.clear()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        logging.info(f"{self.name} scheduler shut down")
+
+
+_schedulers: Dict[str, FairScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name: str, max_workers: int) -> FairScheduler:
+    """The process-wide scheduler called `name`, created with max_workers threads on first use"""
+    with _schedulers_lock:
+        if name not in _schedulers:
+            _schedulers[name] = FairScheduler(max_workers, name)
+        return _schedulers[name]
@@ -0,0 +1,159 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import re
+
+# A module heading such as "Module 1", "MODULE I", "Module – 2:" or "Module-IV Title" at the
+# start of a line, or the heading of a section that ends the module listing before it. A
+# section heading stands alone on its line, so a topic such as "References and pointers"
+# doesn't end the module.
+BOUNDARY = re.compile(
+    r"^[ \t]*(?:module[ \t]*[-:–—.]?[ \t]*(?P<number>\d{1,2}|[ivx]{1,5})\b[ \t]*[-:–—.]?[ \t]*(?P<title>.*)"
+    r"|(?P<end>text[ \t]*books?|reference[ \t]*books?|references|teaching[ \t]+plan|course[ \t]+outcomes?"
+    r"|model[ \t]+question[ \t]+paper|course[ \t]+assessment|assessment[ \t]+pattern)"
+    r"[ \t]*(?:\([^)\n]*\))?[ \t]*:?[ \t]*)$",
+    re.IGNORECASE | re.MULTILINE
+)
+# Numbered teaching-plan topics such as "2.1 Processes, Process states", or a bare "2.5"
+TOPIC_NUMBER = re.compile(r"^[ \t]*(\d{1,2}\.\d{1,2})(?:[ \t]+(.*))?$")
+# Lecture-hour counts and page numbers that PDF extraction leaves between topics
+NOISE = re.compile(r"^[ \t]*(\d{1,3}|\(?\d{1,2}[ \t]*hours?\)?)[ \t]*$", re.IGNORECASE)
+# Lines repeated this often are page headers or footers rather than content
+REPEATED_LINE = 3
+
+_ROMAN = {"i": 1, "v": 5, "x": 10}
+
+
+class Topic(NamedTuple):
+    """One topic line (or wrapped paragraph) of a module, with its span in the syllabus text"""
+    number: Optional[str]
+    text: str
+    start: int
+    end: int
+
+
+class Module(NamedTuple):
+    key: str
+    number: int
+    title: str
+    start: int
+    end: int
+    topics: Tuple[Topic, ...]
+
+    def lines(self) -> List[str]:
+        """The module's title and topics, one per line, without page noise"""
+        lines = [self.title] if self.title else []
+        lines.extend(f"{topic.number} {topic.text}" if topic.number else topic.text for topic in self.topics)
+        return lines
+
+    @property
+    def content(self) -> str:
+        return "\n".join(self.lines())
+
+
+class SyllabusTree(NamedTuple):
+    modules: Tuple[Module, ...]
+
+    def get(self, key: str) -> Optional[Module]:
+        for module in self.modules:
+            if module.key == key:
+                return module
+        return None
+
+    def contents(self) -> Dict[str, str]:
+        return {module.key: module.content for module in self.modules}
+
+
+def module_number(token: str) -> Optional[int]:
+    """A module number written in digits or roman numerals, such as 3 or IV"""
+    if token.isdigit():
+        return int(token)
+    values = [_ROMAN[c] for c in token.lower()]
+    total = sum(-v if i + 1 < len(values) and v < values[i + 1] else v for i, v in enumerate(values))
+    return total or None
+
+
+def _block_lines(text: str, start: int, end: int, repeated: Set[str]) -> List[Tuple[int, str]]:
+    """(offset, line) pairs of text[start:end], minus page headers and hour counts"""
+    lines, offset = [], start
+    for line in text[start:end].splitlines(keepends=True):
+        content = line.rstrip("\r\n")
+        if content.strip() not in repeated and not NOISE.match(content):
+            lines.append((offset, content))
+        offset += len(line)
+    return lines
+
+
+def _collect_topics(block: List[Tuple[int, str]]) -> Tuple[Topic, ...]:
+    """
+    Numbered lines become one topic each (a bare number takes the next line as its text);
+    other lines are joined into paragraph topics, split on blank lines.
+    """
+    topics: List[Topic] = []
+    paragraph: List[Tuple[int, str]] = []
+    pending_number: Optional[Tuple[str, int]] = None
+
+    def flush():
+        if paragraph:
+            text = " ".join(" ".join(line.split()) for _, line in paragraph)
+            start = paragraph[0][0]
+            end = paragraph[-1][0] + len(paragraph[-1][1])
+            topics.append(Topic(None, text, start, end))
+            paragraph.clear()
+
+    for offset, line in block:
+        if not line.strip():
+            flush()
+            continue
+        numbered = TOPIC_NUMBER.match(line)
+        if numbered:
+            flush()
+            if numbered.group(2) and numbered.group(2).strip():
+                topics.append(Topic(numbered.group(1), " ".join(numbered.group(2).split()), offset, offset + len(line)))
+                pending_number = None
+            else:
+                pending_number = (numbered.group(1), offset)
+            continue
+        if pending_number:
+            number, start = pending_number
+            topics.append(Topic(number, " ".join(line.split()), start, offset + len(line)))
+            pending_number = None
+            continue
+        paragraph.append((offset, line))
+    flush()
+    return tuple(topics)
+
+
+@lru_cache(maxsize=64)
+def parse_syllabus(text: str) -> SyllabusTree:
+    """
+    Parse syllabus text into modules and their topics in linear time.
+
+    One regex pass finds the module headings and the sections that end a listing; only
+    the lines inside modules are then looked at individually. KTU syllabi often list
+    the modules twice, as prose under "Syllabus" and as numbered topics under "Teaching
+    Plan"; for each module number the listing with the most numbered topics wins, then
+    the one with the most topics, then the later one. The result is cached and shared,
+    so it is immutable.
+    """
+    counts = Counter(map(str.strip, text.splitlines()))
+    repeated = {line for line, count in counts.items()
+                if count >= REPEATED_LINE and line and not TOPIC_NUMBER.match(line)}
+
+    boundaries = list(BOUNDARY.finditer(text))
+    candidates: Dict[int, List[Module]] = {}
+    for index, heading in enumerate(boundaries):
+        if heading.group("end"):
+            continue
+        number = module_number(heading.group("number"))
+        end = boundaries[index + 1].start() if index + 1 < len(boundaries) else len(text)
+        topics = _collect_topics(_block_lines(text, heading.end(), end, repeated))
+        title = " ".join(heading.group("title").split())
+        candidates.setdefault(number, []).append(Module(f"mod{number}", number, title, heading.start(), end, topics))
+
+    def score(indexed: Tuple[int, Module]):
+        index, module = indexed
+        return sum(1 for topic in module.topics if topic.number), len(module.topics), index
+
+    modules = [max(enumerate(found), key=score)[1] for found in candidates.values()]
+    return SyllabusTree(tuple(sorted(modules, key=lambda module: module.number)))
@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable, Dict, List, Optional
+import json
+import os
+import threading
+import time
+
+_current_trace: ContextVar[Optional["JobTrace"]] = ContextVar("studygpt_job_trace", default=None)
+
+
+class JobTrace:
+    """Collects timing spans for one processing job.
+
+    Spans are exported in the Chrome trace event format, which chrome://tracing,
+    Perfetto and speedscope can open directly.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._events: List[Dict] = []
+
+    @contextmanager
+    def span(self, name: str, category: str = "job", **args):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            ended = time.perf_counter()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (started - self._origin) * 1e6,
+                "dur": (ended - started) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args
+            }
+            with self._lock:
+                self._events.append(event)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, total and max duration per span name, in milliseconds"""
+        summary = {}
+        with self._lock:
+            events = list(self._events)
+        for event in events:
+            entry = summary.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            duration_ms = event["dur"] / 1000
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + duration_ms, 3)
+            entry["max_ms"] = round(max(entry["max_ms"], duration_ms), 3)
+        return summary
+
+    def export(self, path: str):
+        with self._lock:
+            events = list(self._events)
+        thread_names = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": f"thread-{index}"}}
+            for index, tid in enumerate(sorted({event["tid"] for event in events}))
+        ]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": thread_names + events,
+                "displayTimeUnit": "ms",
+                "otherData": {"job": self.name}
+            }, f)
+
+
+def start_trace(name: str) -> JobTrace:
+    """Start a trace that spans opened in the current context (and its copies) record into"""
+    trace = JobTrace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[JobTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, category: str = "job", **args):
+    """Time a block against the current job trace; a no-op outside of a traced job"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, category, **args):
+        yield
+
+
+def in_current_context(func: Callable) -> Callable:
+    """Bind func to a copy of the current context so spans recorded from worker threads land in the job trace"""
+    context = copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
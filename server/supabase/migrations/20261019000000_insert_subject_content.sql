@@ -0,0 +1,43 @@
+-- Inserts all generated content for a subject in a single transactional call.
+--
+-- p_flashcards: [{"question": ..., "answer": ..., "module_no": "1"}, ...]
+-- p_topics:     [{"module_no": "1", "topics": ["...", ...]}, ...]
+-- p_questions:  [{"module_no": "1", "questions": [{"question": ..., "answer": ...}, ...]}, ...]
+--
+-- Delegates to the existing per-module functions so the table layout stays defined
+-- in one place. A function call runs in one transaction, so either everything in
+-- the payload is written or nothing is.
+create or replace function insert_subject_content(
+    p_subject_id uuid,
+    p_flashcards jsonb default '[]'::jsonb,
+    p_topics jsonb default '[]'::jsonb,
+    p_questions jsonb default '[]'::jsonb
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_module jsonb;
+    v_topic_modules integer := 0;
+    v_question_modules integer := 0;
+begin
+    if jsonb_array_length(p_flashcards) > 0 then
+        perform insert_flashcards(p_subject_id, p_flashcards);
+    end if;
+
+    for v_module in select value from jsonb_array_elements(p_topics) loop
+        perform insert_module_topics(p_subject_id, v_module->>'module_no', v_module->'topics');
+        v_topic_modules := v_topic_modules + 1;
+    end loop;
+
+    for v_module in select value from jsonb_array_elements(p_questions) loop
+        perform insert_module_questions(p_subject_id, v_module->>'module_no', v_module->'questions');
+        v_question_modules := v_question_modules + 1;
+    end loop;
+
+    return jsonb_build_object(
+        'flashcards', jsonb_array_length(p_flashcards),
+        'topic_modules', v_topic_modules,
+        'question_modules', v_question_modules
+    );
+end;
+$$;
@@ -0,0 +1,26 @@
+-- Marks a batch of a user's schedules as synced to Google Calendar in one call.
+--
+-- p_updates: [{"id": "<schedule uuid>", "google_event_id": "..."}, ...]
+--
+-- Only rows created by p_user_id are touched. Returns the number of rows updated.
+create or replace function mark_schedules_synced(
+    p_user_id text,
+    p_updates jsonb
+) returns integer
+language plpgsql
+as $$
+declare
+    v_updated integer;
+begin
+    update schedules s
+    set google_event_id = u.google_event_id,
+        is_synced = true,
+        last_sync_at = now()
+    from jsonb_to_recordset(p_updates) as u(id uuid, google_event_id text)
+    where s.id = u.id
+      and s.created_by::text = p_user_id;
+
+    get diagnostics v_updated = row_count;
+    return v_updated;
+end;
+$$;
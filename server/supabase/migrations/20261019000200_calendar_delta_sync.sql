@@ -0,0 +1,100 @@
+-- Incremental Google Calendar sync.
+--
+-- schedules.sync_hash is the hash of the event body last sent to Google, and
+-- schedules.updated_at moves whenever the event content changes. calendar_sync_state
+-- keeps a per-subject watermark (synced_through) and the schedule id -> Google event
+-- id map that lets a sync delete the events of removed schedules.
+alter table schedules add column if not exists sync_hash text;
+alter table schedules add column if not exists updated_at timestamptz not null default now();
+
+create or replace function touch_schedule_updated_at() returns trigger
+language plpgsql
+as $$
+begin
+    -- Sync bookkeeping updates must not make a row look changed
+    if (new.title, new.description, new.start_time, new.end_time)
+        is distinct from (old.title, old.description, old.start_time, old.end_time) then
+        new.updated_at = now();
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists schedules_touch_updated_at on schedules;
+create trigger schedules_touch_updated_at
+    before update on schedules
+    for each row execute function touch_schedule_updated_at();
+
+create index if not exists schedules_subject_updated_at_idx on schedules (subject_id, updated_at);
+
+create table if not exists calendar_sync_state (
+    user_id text not null,
+    subject_id uuid not null,
+    synced_through timestamptz,
+    event_ids jsonb not null default '{}'::jsonb,
+    updated_at timestamptz not null default now(),
+    primary key (user_id, subject_id)
+);
+
+-- Schedules synced before this migration have their event id on the row but not in the
+-- map, so removing them would never delete their events; seed the map from those rows.
+-- Their updated_at is the migration time, which becomes the watermark: a later edit moves
+-- a row past it, so the row is fetched and, as it has no sync_hash yet, patched.
+insert into calendar_sync_state as st (user_id, subject_id, synced_through, event_ids)
+select s.created_by::text, s.subject_id, max(s.updated_at), jsonb_object_agg(s.id::text, s.google_event_id)
+from schedules s
+where s.google_event_id is not null
+  and s.subject_id is not null
+group by s.created_by, s.subject_id
+on conflict (user_id, subject_id) do update
+set event_ids = excluded.event_ids || st.event_ids,
+    synced_through = coalesce(st.synced_through, excluded.synced_through);
+
+-- Records the outcome of one sync in a single transaction.
+--
+-- p_synced:  [{"id": "<schedule uuid>", "google_event_id": "...", "sync_hash": "..."}, ...]
+-- p_deleted: ["<schedule uuid>", ...] whose events were deleted
+-- p_synced_through: new watermark, or null to keep the current one
+--
+-- Returns the number of schedule rows updated.
+create or replace function record_calendar_sync(
+    p_user_id text,
+    p_subject_id uuid,
+    p_synced jsonb default '[]'::jsonb,
+    p_deleted jsonb default '[]'::jsonb,
+    p_synced_through timestamptz default null
+) returns integer
+language plpgsql
+as $$
+declare
+    v_updated integer;
+    v_event_ids jsonb;
+begin
+    update schedules s
+    set google_event_id = u.google_event_id,
+        sync_hash = u.sync_hash,
+        is_synced = true,
+        last_sync_at = now()
+    from jsonb_to_recordset(p_synced) as u(id uuid, google_event_id text, sync_hash text)
+    where s.id = u.id
+      and s.created_by::text = p_user_id;
+    get diagnostics v_updated = row_count;
+
+    select coalesce(jsonb_object_agg(u->>'id', u->>'google_event_id'), '{}'::jsonb)
+    into v_event_ids
+    from jsonb_array_elements(p_synced) as u;
+
+    insert into calendar_sync_state as st (user_id, subject_id, synced_through, event_ids)
+    values (p_user_id, p_subject_id, p_synced_through, v_event_ids)
+    on conflict (user_id, subject_id) do update
+    set event_ids = (st.event_ids || excluded.event_ids)
+            - array(select jsonb_array_elements_text(p_deleted)),
+        synced_through = coalesce(excluded.synced_through, st.synced_through),
+        updated_at = now();
+
+    return v_updated;
+end;
+$$;
+
+-- Superseded by record_calendar_sync
+drop function if exists mark_schedules_synced(text, jsonb);
@@ -0,0 +1,9 @@
+-- Google OAuth tokens refreshed by the server during calendar sync, so a refreshed
+-- access token outlives the request (and the process) that obtained it.
+create table if not exists user_google_tokens (
+    user_id text primary key,
+    access_token text not null,
+    refresh_token text not null,
+    expiry timestamptz,
+    updated_at timestamptz not null default now()
+);
@@ -0,0 +1,67 @@
+from model.src.utils.question_paper import build_question_index, parse_question_paper, question_lines
+
+PAPER = """\
+APJ ABDUL KALAM TECHNOLOGICAL UNIVERSITY
+Course Code: CST206
+Duration: 3 Hours
+PART A
+Answer all questions, each carries 3 marks.
+1 What is a system call?
+2 Define process control block.
+3 Explain race condition with an example.
+APJ ABDUL KALAM TECHNOLOGICAL UNIVERSITY
+PART B
+Module -1
+11 a) Explain the layered structure of an operating system. (8)
+b) Describe the services of an operating system. (6)
+OR
+12 Explain the process state transition diagram. 14
+Module -2
+13 a) Explain round robin scheduling.
+b) Compare FCFS and SJF scheduling. (5)
+APJ ABDUL KALAM TECHNOLOGICAL UNIVERSITY
+"""
+
+
+def test_part_a_numbering_and_modules():
+    part_a = [q for q in parse_question_paper(PAPER) if q.part == "A"]
+    assert [(q.number, q.module, q.marks) for q in part_a] == [(1, 1, 3), (2, 1, 3), (3, 2, 3)]
+    assert part_a[0].text == "What is a system call?"
+
+
+def test_part_b_sub_parts_and_marks():
+    part_b = [q for q in parse_question_paper(PAPER) if q.part == "B"]
+    assert [(q.label, q.module, q.marks) for q in part_b] == [
+        ("11(a)", 1, 8), ("11(b)", 1, 6), ("12", 1, 14), ("13(a)", 2, 9), ("13(b)", 2, 5)
+    ]
+    assert part_b[0].text == "Explain the layered structure of an operating system."
+
+
+def test_headers_and_noise_are_dropped():
+    texts = " ".join(q.text for q in parse_question_paper(PAPER))
+    assert "KALAM" not in texts and "Duration" not in texts and "OR" not in texts.split()
+
+
+def test_module_heading_tags_questions_past_ktu_numbering():
+    # A paper with more than two questions per module runs past question 20
+    lines = ["PART B", "Module V"] + [f"{number} Explain topic {number}. (14)" for number in range(11, 23)]
+    questions = parse_question_paper("\n".join(lines))
+    assert [q.module for q in questions if q.number in (11, 20, 21, 22)] == [1, 5, 5, 5]
+
+
+def test_ocr_question_numbers():
+    paper = "PART B\nl1 Explain deadlock avoidance. (14)\nI 2 Explain the banker's algorithm. (14)\n"
+    assert [q.number for q in parse_question_paper(paper)] == [11, 12]
+
+
+def test_question_lines_keep_unparsed_papers_whole():
+    assert question_lines(["PART A\n1 What is a kernel?\n", "no questions here"]) == [
+        "Q1 [module 1, 3 marks]: What is a kernel?", "no questions here"
+    ]
+
+
+def test_question_index_counts():
+    index = build_question_index([("2023.pdf", PAPER)])
+    assert index["papers"] == [{"source": "2023.pdf", "questions": 8}]
+    assert index["modules"] == {"mod1": 5, "mod2": 3}
+    assert index["questions"][0]["source"] == "2023.pdf"
@@ -0,0 +1,89 @@
+from collections import Counter
+from contextvars import copy_context
+import pytest
+from model.src.utils.scheduling import FairScheduler, start_job
+
+WEIGHTS = {"interactive": 3.0, "standard": 1.0, "bulk": 1.0}
+
+
+def scheduler() -> FairScheduler:
+    # No worker threads, so the tests decide when tasks are taken off the queues
+    return FairScheduler(0, "test", WEIGHTS)
+
+
+def queue(pool: FairScheduler, user_id: str, job_id: str, count: int, priority: str = "standard",
+          cost: float = 1.0):
+    """Queue count tasks for a job; each returns its (user, job) label"""
+    def run():
+        start_job(user_id, job_id, priority)
+        return [pool.submit_costed(cost, lambda label: label, (user_id, job_id)) for _ in range(count)]
+    return copy_context().run(run)
+
+
+def served(pool: FairScheduler, count: int):
+    """(user, job) labels of the next count tasks, in the order workers would take them"""
+    with pool._condition:
+        return [pool._next_task()[1].args[0] for _ in range(count)]
+
+
+def test_small_job_is_not_queued_behind_large_one():
+    pool = scheduler()
+    queue(pool, "big", "job-20", 20)
+    queue(pool, "small", "job-3", 3)
+    order = served(pool, 23)
+    # The 3-file job is done after 6 tasks instead of waiting for all 20
+    assert [user for user, _ in order[:6]] == ["big", "small"] * 3
+    assert all(user == "big" for user, _ in order[6:])
+
+
+def test_weights_set_the_share_of_each_class():
+    pool = scheduler()
+    queue(pool, "a", "job", 40, "standard")
+    queue(pool, "b", "job", 40, "interactive")
+    shares = Counter(user for user, _ in served(pool, 40))
+    assert shares == {"b": 30, "a": 10}
+
+
+def test_jobs_of_one_user_take_turns():
+    pool = scheduler()
+    queue(pool, "user", "first", 3)
+    queue(pool, "user", "second", 3)
+    assert [job for _, job in served(pool, 6)] == ["first", "second"] * 3
+
+
+def test_costly_tasks_wait_for_credit():
+    pool = scheduler()
+    queue(pool, "heavy", "job", 2, cost=3.0)
+    queue(pool, "light", "job", 6)
+    # The heavy flow banks credit for three turns before running each task
+    order = [user for user, _ in served(pool, 8)]
+    assert order.index("heavy") == 2
+    assert Counter(order) == {"light": 6, "heavy": 2}
+
+
+def test_shutdown_cancels_queued_work():
+    pool = scheduler()
+    futures = queue(pool, "user", "job", 5)
+    pool.shutdown(cancel_futures=True)
+    assert all(future.cancelled() for future in futures)
+    assert pool.queued() == {}
+    with pytest.raises(RuntimeError):
+        queue(pool, "user", "job", 1)
+
+
+def test_shutdown_runs_queued_work_without_cancel():
+    pool = FairScheduler(2, "test-run", WEIGHTS)
+    futures = [copy_context().run(lambda: pool.submit(pow, 2, n)) for n in range(10)]
+    pool.shutdown(wait=True)
+    assert [future.result() for future in futures] == [2 ** n for n in range(10)]
+
+
+@pytest.mark.parametrize("weights", [
+    {"interactive": 0.0, "standard": 1.0, "bulk": 1.0},
+    {"interactive": 1.0, "standard": -1.0, "bulk": 1.0},
+    {"interactive": 1.0, "standard": 1.0},
+    {"interactive": 1.0, "standard": 1.0, "bulk": 1.0, "urgent": 2.0},
+])
+def test_invalid_weights_are_rejected(weights):
+    with pytest.raises(ValueError):
+        FairScheduler(0, "test", weights)
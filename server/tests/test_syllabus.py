@@ -0,0 +1,70 @@
+from model.src.utils.syllabus import parse_syllabus
+
+
+def topics(tree, key):
+    return [topic.text for topic in tree.get(key).topics]
+
+
+def test_heading_variants():
+    tree = parse_syllabus(
+        "MODULE I: Introduction\n"
+        "1.1 Operating system overview\n"
+        "Module – 2: Processes\n"
+        "Process states, context switch\n"
+        "Module-IV Memory\n"
+        "4.1 Paging\n"
+        "Module 5\n"
+        "Disk scheduling\n"
+    )
+    assert [module.key for module in tree.modules] == ["mod1", "mod2", "mod4", "mod5"]
+    assert [module.title for module in tree.modules] == ["Introduction", "Processes", "Memory", ""]
+    assert topics(tree, "mod1") == ["Operating system overview"]
+    assert topics(tree, "mod2") == ["Process states, context switch"]
+
+
+def test_roman_numerals():
+    tree = parse_syllabus("Module III\nDeadlocks\nModule IX\nSecurity\nModule XII\nCase studies\n")
+    assert [module.number for module in tree.modules] == [3, 9, 12]
+
+
+def test_numbered_topics_and_bare_numbers():
+    tree = parse_syllabus("Module 1\n1.1 Kernels\n1.2\nSystem calls\n")
+    module = tree.get("mod1")
+    assert [(topic.number, topic.text) for topic in module.topics] == [("1.1", "Kernels"), ("1.2", "System calls")]
+
+
+def test_section_heading_ends_module():
+    for heading in ("Text Books", "Reference Books:", "References", "TEACHING PLAN", "Course Outcomes (CO)"):
+        tree = parse_syllabus(f"Module 1\nPaging\n{heading}\n1. Silberschatz, Operating System Concepts\n")
+        assert topics(tree, "mod1") == ["Paging"], heading
+
+
+def test_topic_starting_with_section_keyword_stays_in_module():
+    tree = parse_syllabus(
+        "Module 1\n"
+        "Classes and objects.\n"
+        "References and pointers. Inline functions.\n"
+        "\n"
+        "Constructors and destructors.\n"
+        "Text Book\n"
+        "1. Stroustrup\n"
+    )
+    assert topics(tree, "mod1") == [
+        "Classes and objects. References and pointers. Inline functions.",
+        "Constructors and destructors."
+    ]
+
+
+def test_longest_numbered_listing_wins():
+    tree = parse_syllabus(
+        "Module 1\nProcesses, threads and scheduling\n"
+        "Teaching Plan\n"
+        "Module 1\n1.1 Processes\n1.2 Threads\n1.3 Scheduling\n"
+    )
+    assert topics(tree, "mod1") == ["Processes", "Threads", "Scheduling"]
+
+
+def test_repeated_page_headers_are_dropped():
+    header = "APJ ABDUL KALAM TECHNOLOGICAL UNIVERSITY"
+    tree = parse_syllabus(f"Module 1\n{header}\nPaging\n\n{header}\nSegmentation\n{header}\n")
+    assert topics(tree, "mod1") == ["Paging", "Segmentation"]